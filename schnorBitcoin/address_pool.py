@@ -0,0 +1,137 @@
+import argparse, json, os, sys, time
+from utils import print_fails, print_success
+from schnorr_lib import n, tagged_hash, int_from_bytes, int_from_hex, bytes_from_point, has_even_y, \
+    point_mul_G, point_add, point_sequence
+from generate_p2rt_address import encode_many, network_hrp
+
+# Pool of taproot deposit addresses derived from one master key.
+# Key i is d_i = d + i*t with the public tweak t = hash(P), so its public
+# key is P_i = P + i*T (T = t*G): every address costs one point addition,
+# the points of a chunk are normalized together and encoded in bulk.
+# Like non-hardened BIP32, P and t are enough to derive all the addresses
+# (watch-only), and one leaked d_i reveals the master key d.
+# The pool is written as CSV lines "index,publicKey,p2trAddress" and a run
+# continues from the last complete line of an existing file.
+
+HEADER = "index,publicKey,p2trAddress\n"
+
+
+# Public tweak t of the master public key P
+def pool_tweak(P) -> int:
+    return int_from_bytes(tagged_hash("AddressPool/tweak", bytes_from_point(P))) % n
+
+
+# Private key of address i, negated like create_keypair.py when the point has an odd y
+def pool_private_key(master: int, index: int) -> int:
+    P = point_mul_G(master)
+    d = (master + index * pool_tweak(P)) % n
+    return d if has_even_y(point_mul_G(d)) else n - d
+
+
+# Number of complete lines of the pool file, a partly written last line
+# (from an interrupted run) is cut off; checks first that the file is a
+# pool of the same master key and network, and leaves it untouched if not
+def resume_index(path: str, P, network: str = 'testnet') -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        header = f.readline().decode(errors="replace")
+        first = f.readline().decode(errors="replace")
+    if not header.endswith("\n"):
+        # Empty, or interrupted while writing the header
+        if not HEADER.startswith(header):
+            raise ValueError("The file is not an address pool.")
+        open(path, "wb").close()
+        return 0
+    if header != HEADER:
+        raise ValueError("The file is not an address pool.")
+    if first.endswith("\n"):
+        fields = first.rstrip("\n").split(",")
+        if len(fields) != 3:
+            raise ValueError("The file is not an address pool.")
+        if fields[1] != bytes_from_point(P).hex():
+            raise ValueError("The address pool was generated with another master key.")
+        if not fields[2].startswith(network_hrp(network) + "1"):
+            raise ValueError("The address pool was generated for another network.")
+
+    with open(path, "r+b") as f:
+        lines = 0
+        end = 0
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            if b"\n" in block:
+                end = f.tell() - len(block) + block.rfind(b"\n") + 1
+            lines += block.count(b"\n")
+        f.truncate(end)
+    return lines - 1
+
+
+# Write the addresses up to count-1 to path, after the ones already
+# there, chunk_size at a time; returns the number of addresses of the pool
+def generate_pool(master: int, count: int, path: str, network: str = 'testnet', chunk_size: int = 4096) -> int:
+    if not (1 <= master <= n - 1):
+        raise ValueError('The secret key must be an integer in the range 1..n-1.')
+    P = point_mul_G(master)
+    t = pool_tweak(P)
+    T = point_mul_G(t)
+    start = resume_index(path, P, network)
+    if start >= count:
+        return start
+
+    with open(path, "a") as f:
+        if f.tell() == 0:
+            f.write(HEADER)
+        index = start
+        Pi = point_add(P, point_mul_G(start * t % n)) if start else P
+        while index < count:
+            size = min(chunk_size, count - index)
+            points = point_sequence(Pi, T, size)
+            pubkeys = [bytes_from_point(Q) for Q in points]
+            addresses = encode_many(pubkeys, network)
+            f.write("".join("%d,%s,%s\n" % (index + i, pk.hex(), a)
+                            for i, (pk, a) in enumerate(zip(pubkeys, addresses))))
+            # Lines are on disk before the next chunk is started
+            f.flush()
+            os.fsync(f.fileno())
+            index += size
+            Pi = point_add(points[-1], T)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generates a pool of taproot addresses derived from one master key, continuing an existing pool file')
+    parser.add_argument('-c', '--count', type=int, required=True, help='Total number of addresses of the pool')
+    parser.add_argument('-o', '--output', type=str, default="address_pool.csv", help='CSV file of the pool')
+    parser.add_argument('-i', '--index', type=int, default=0, help='Index of the keypair of users.json used as master key')
+    parser.add_argument('-k', '--key', type=str, help='Master private key (hex), instead of a keypair of users.json')
+    parser.add_argument('--network', type=str, default="testnet", help="Network of the addresses, 'mainnet', 'testnet' or 'regtest'")
+    parser.add_argument('--chunk', type=int, default=4096, help='Addresses computed and written at a time')
+    args = parser.parse_args()
+
+    try:
+        if args.key:
+            master = int_from_hex(args.key)
+        else:
+            try:
+                users = json.load(open("users.json", "r"))["users"]
+            except Exception:
+                print_fails("[e] Error. File nonexistent, create it with create_keypair.py")
+                sys.exit(2)
+            if args.index < 0 or args.index >= len(users):
+                raise RuntimeError("Index is out of range")
+            master = int_from_hex(users[args.index]["privateKey"])
+
+        start = time.perf_counter()
+        total = generate_pool(master, args.count, args.output, args.network, args.chunk)
+        print_success("[i] Address pool:", total, "addresses in", args.output,
+                      "(%.1f s)" % (time.perf_counter() - start))
+    except Exception as e:
+        print_fails("[e] Exception:", e)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
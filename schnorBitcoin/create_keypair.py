@@ -1,6 +1,6 @@
 import argparse, json, os
 
-from schnorr_lib import n, has_even_y, pubkey_point_gen_from_int, bytes_from_point 
+from schnorr_lib import n, has_even_y, pubkey_points_gen_from_ints, bytes_from_point
 from generate_p2rt_address import generate_p2tr_address
 def create_keypair(n_keys: int):
     # Create json
@@ -10,12 +10,15 @@ def create_keypair(n_keys: int):
     }
 
     # Generate n keys
+    privkeys = []
     for i in range(0, n_keys):
         privkey = os.urandom(32)
-        privkey_int = int(privkey.hex(), 16) % n
+        privkeys.append(int(privkey.hex(), 16) % n)
 
-        publickey = pubkey_point_gen_from_int(privkey_int)
+    # Public keys are computed together and normalized with a single inversion
+    publickeys = pubkey_points_gen_from_ints(privkeys)
 
+    for privkey_int, publickey in zip(privkeys, publickeys):
         # Check if the point P has the y-coordinate even; negate the private key otherwise
         privkey_even = privkey_int if has_even_y(publickey) else n - privkey_int
 
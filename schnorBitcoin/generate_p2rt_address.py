@@ -1,4 +1,5 @@
 CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+CHARSET_REV = {c: i for i, c in enumerate(CHARSET)}
 
 # Constants for Bech32 and Bech32m
 BECH32_CONST = 1
@@ -13,25 +14,49 @@ GENERATOR = [
     0x2a1462b3,
 ]
 
-def bech32_polymod(values):
-    """Internal function that computes the Bech32 checksum."""
-    chk = 1
+# XOR of the generator coefficients selected by each value of the 5 top bits
+POLYMOD_TABLE = [0] * 32
+for _top in range(32):
+    for _i in range(5):
+        if (_top >> _i) & 1:
+            POLYMOD_TABLE[_top] ^= GENERATOR[_i]
+
+# Human readable parts of the networks
+HRPS = {
+    'mainnet': 'bc',
+    'testnet': 'tb',
+    'regtest': 'bcrt',
+}
+
+def bech32_polymod_from(chk, values):
+    """Continue a Bech32 checksum computation from the state chk."""
+    table = POLYMOD_TABLE
     for v in values:
-        top = chk >> 25
-        chk = ((chk & 0x1ffffff) << 5) ^ v
-        for i in range(5):
-            chk ^= GENERATOR[i] if ((top >> i) & 1) else 0
+        chk = ((chk & 0x1ffffff) << 5) ^ v ^ table[chk >> 25]
     return chk
 
+def bech32_polymod(values):
+    """Internal function that computes the Bech32 checksum."""
+    return bech32_polymod_from(1, values)
+
 def bech32_hrp_expand(hrp):
     """Expand the HRP for checksum computation."""
     return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
 
+# Checksum states after the expanded HRP of each network
+HRP_STATES = {hrp: bech32_polymod(bech32_hrp_expand(hrp)) for hrp in HRPS.values()}
+
+def bech32_hrp_state(hrp):
+    """Checksum state after the expanded HRP, precomputed for the networks' HRPs."""
+    state = HRP_STATES.get(hrp)
+    if state is None:
+        state = bech32_polymod(bech32_hrp_expand(hrp))
+    return state
+
 def bech32_create_checksum(hrp, data, spec):
     """Compute the checksum values given HRP and data."""
-    values = bech32_hrp_expand(hrp) + data
     const = BECH32M_CONST if spec == 'bech32m' else BECH32_CONST
-    polymod = bech32_polymod(values + [0, 0, 0, 0, 0, 0]) ^ const
+    polymod = bech32_polymod_from(bech32_hrp_state(hrp), data + [0, 0, 0, 0, 0, 0]) ^ const
     return [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
 
 def bech32_encode(hrp, data, spec='bech32'):
@@ -40,6 +65,46 @@ def bech32_encode(hrp, data, spec='bech32'):
     combined = data + checksum
     return hrp + '1' + ''.join([CHARSET[d] for d in combined])
 
+def bech32_decode(bech):
+    """Validate a Bech32 or Bech32m string and return its HRP, data values and spec."""
+    if any(ord(c) < 33 or ord(c) > 126 for c in bech):
+        raise ValueError("Invalid character in address.")
+    if bech.lower() != bech and bech.upper() != bech:
+        raise ValueError("Mixed case address.")
+    bech = bech.lower()
+    pos = bech.rfind('1')
+    if pos < 1 or pos + 7 > len(bech) or len(bech) > 90:
+        raise ValueError("Invalid address length or separator position.")
+    hrp = bech[:pos]
+    try:
+        data = [CHARSET_REV[c] for c in bech[pos + 1:]]
+    except KeyError:
+        raise ValueError("Invalid character in address data.")
+    polymod = bech32_polymod_from(bech32_hrp_state(hrp), data)
+    if polymod == BECH32_CONST:
+        spec = 'bech32'
+    elif polymod == BECH32M_CONST:
+        spec = 'bech32m'
+    else:
+        raise ValueError("Invalid address checksum.")
+    return hrp, data[:-6], spec
+
+def bytes_to_5bit(data):
+    """Convert bytes to 5-bit values (padded with zero bits), a whole buffer at a time."""
+    count = (len(data) * 8 + 4) // 5
+    acc = int.from_bytes(data, 'big') << (count * 5 - len(data) * 8)
+    return [(acc >> shift) & 31 for shift in range(count * 5 - 5, -1, -5)]
+
+def bytes_from_5bit(data):
+    """Convert 5-bit values back to bytes, None if the padding is invalid."""
+    acc = 0
+    for value in data:
+        acc = (acc << 5) | value
+    pad = len(data) * 5 % 8
+    if pad >= 5 or acc & ((1 << pad) - 1):
+        return None
+    return (acc >> pad).to_bytes(len(data) * 5 // 8, 'big')
+
 def convertbits(data, frombits, tobits, pad=True):
     """General power-of-2 base conversion."""
     acc = 0
@@ -75,18 +140,62 @@ def generate_p2tr_address(x_only_pub_key_hex, network='testnet'):
     witness_program = x_only_pub_key_bytes
     
     # Convert the witness program to 5-bit words
-    data = [witness_version] + convertbits(witness_program, 8, 5)
+    data = [witness_version] + bytes_to_5bit(witness_program)
     
     # Choose the correct HRP based on the network
-    if network == 'mainnet':
-        hrp = 'bc'
-    elif network == 'testnet':
-        hrp = 'tb'
-    elif network == 'regtest':
-        hrp = 'bcrt'
-    else:
-        raise ValueError("Invalid network. Use 'mainnet', 'testnet', or 'regtest'.")
+    hrp = network_hrp(network)
     
     # Encode the address using Bech32m
     address = bech32_encode(hrp, data, spec='bech32m')
     return address
+
+def network_hrp(network):
+    """Get the HRP of a network."""
+    if network not in HRPS:
+        raise ValueError("Invalid network. Use 'mainnet', 'testnet', or 'regtest'.")
+    return HRPS[network]
+
+def decode_segwit_address(address, network='testnet'):
+    """Validate a segwit address of the network and return its witness version and program."""
+    hrp, data, spec = bech32_decode(address)
+    if hrp != network_hrp(network):
+        raise ValueError("The address does not belong to the %s network." % network)
+    if not data or data[0] > 16:
+        raise ValueError("Invalid witness version.")
+    witness_version = data[0]
+    witness_program = bytes_from_5bit(data[1:])
+    if witness_program is None or len(witness_program) < 2 or len(witness_program) > 40:
+        raise ValueError("Invalid witness program.")
+    if witness_version == 0 and len(witness_program) not in (20, 32):
+        raise ValueError("Invalid witness program length for version 0.")
+    if (witness_version == 0) != (spec == 'bech32'):
+        raise ValueError("Version 0 addresses use Bech32, later versions Bech32m.")
+    return witness_version, witness_program
+
+def encode_many(x_only_pub_keys, network='testnet'):
+    """P2TR addresses of many x-only public keys (bytes or hex)."""
+    hrp = network_hrp(network)
+    # Checksum state after the HRP and the witness version, shared by all keys
+    state = bech32_polymod_from(bech32_hrp_state(hrp), [1])
+    prefix = hrp + '1' + CHARSET[1]
+    addresses = []
+    for key in x_only_pub_keys:
+        if isinstance(key, str):
+            key = bytes.fromhex(key)
+        if len(key) != 32:
+            raise ValueError("Invalid public key length. Expected 32 bytes for x-only public key.")
+        data = bytes_to_5bit(key)
+        polymod = bech32_polymod_from(bech32_polymod_from(state, data), [0, 0, 0, 0, 0, 0]) ^ BECH32M_CONST
+        data += [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+        addresses.append(prefix + ''.join([CHARSET[d] for d in data]))
+    return addresses
+
+def decode_many(addresses, network='testnet'):
+    """Witness version and program of many addresses, None for the invalid ones."""
+    results = []
+    for address in addresses:
+        try:
+            results.append(decode_segwit_address(address, network))
+        except ValueError:
+            results.append(None)
+    return results
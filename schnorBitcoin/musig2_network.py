@@ -0,0 +1,391 @@
+import argparse, asyncio, json, os, shutil, subprocess, sys, tempfile
+from typing import Optional
+from utils import print_fails, print_success
+from schnorr_lib import n, p, sha256, tagged_hash, bytes_from_int, int_from_bytes, int_from_hex, \
+    bytes_from_point, has_even_y, point_add, point_mul, point_mul_G, KeyAggContext, NoncePool, \
+    musig_partial_verify
+
+# MuSig2 between processes: every signer runs a server holding only its own
+# private key, a coordinator connects to all of them and drives the rounds.
+# Messages are JSON objects, one per line, each carrying the id of its
+# signing session so that many sessions can run over the same connections:
+#
+#   {"id", "type": "hello"}                           -> {"id", "pubkey"}
+#   {"id", "type": "nonce"}                           -> {"id", "R": [R1, R2]}
+#   {"id", "type": "sign", "msg", "pubkeys", "R"}     -> {"id", "s"}
+#
+# and any failure is answered with {"id", "error"}. Points travel as the
+# hex of x || y, scalars and keys as hex.
+
+NU = 2
+
+
+def point_to_hex(P) -> str:
+    return (bytes_from_int(P[0]) + bytes_from_int(P[1])).hex()
+
+
+def point_from_hex(h: str):
+    b = bytes.fromhex(h)
+    if len(b) != 64:
+        raise ValueError('The point must be a 64-byte array.')
+    P = (int_from_bytes(b[:32]), int_from_bytes(b[32:]))
+    if P[0] >= p or P[1] >= p or (P[1] * P[1] - pow(P[0], 3, p) - 7) % p != 0:
+        raise ValueError('The point is not on the curve.')
+    return P
+
+
+# Open a connection to "unix:/path" or "host:port"
+async def open_connection(address: str):
+    if address.startswith("unix:"):
+        return await asyncio.open_unix_connection(address[5:])
+    host, port = address.rsplit(":", 1)
+    return await asyncio.open_connection(host, int(port))
+
+
+# Listen on "unix:/path" or "host:port"
+async def start_server(handler, address: str):
+    if address.startswith("unix:"):
+        return await asyncio.start_unix_server(handler, address[5:])
+    host, port = address.rsplit(":", 1)
+    return await asyncio.start_server(handler, host, int(port))
+
+
+# Aggregate nonce R = R1 + b*R2 and b = h(R1 || R2 || X || M) of a session
+def aggregate_nonce(ctx: KeyAggContext, Rj_list: list, msg: bytes):
+    b = int_from_bytes(sha256(b''.join(bytes_from_point(Rj) for Rj in Rj_list) + ctx.X_bytes + msg)) % n
+    b_powers = [pow(b, j, n) for j in range(len(Rj_list))]
+    R = None
+    for bj, Rj in zip(b_powers, Rj_list):
+        R = point_add(R, point_mul(Rj, bj))
+    if R is None:
+        raise ValueError('The aggregate nonce is the point at infinity.')
+    return R, b_powers
+
+
+# One signer: answers the rounds of every session with its own key and
+# nonces taken from a NoncePool, each nonce used for one session only
+class SignerServer:
+    def __init__(self, privateKey: str, pool_size: int = 64, nonce_file: Optional[str] = None):
+        d = int_from_hex(privateKey)
+        if not (1 <= d <= n - 1):
+            raise ValueError('The secret key must be an integer in the range 1..n-1.')
+        # Keys are x-only, sign with the key of the even y point
+        self.d = d if has_even_y(point_mul_G(d)) else n - d
+        self.pool = NoncePool(bytes_from_int(self.d).hex(), size=pool_size, nu=NU, path=nonce_file)
+        self.pubkey = self.pool.pubkey
+        self._contexts = {}
+
+    def close(self) -> None:
+        self.pool.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        sessions = {}
+        lock = asyncio.Lock()
+
+        async def reply(message: dict) -> None:
+            async with lock:
+                writer.write((json.dumps(message) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    response = {"id": request["id"]}
+                    response.update(self.answer(request, sessions))
+                except Exception as e:
+                    response = {"id": request.get("id") if isinstance(request, dict) else None, "error": str(e)}
+                await reply(response)
+        finally:
+            for nonce in sessions.values():
+                nonce.erase()
+            writer.close()
+
+    # Answer one request, sessions holds the nonces given out on this connection
+    def answer(self, request: dict, sessions: dict) -> dict:
+        kind = request.get("type")
+        if kind == "hello":
+            return {"pubkey": self.pubkey.hex()}
+        if kind == "nonce":
+            if request["id"] in sessions:
+                raise ValueError('The session already has a nonce.')
+            nonce = self.pool.take()
+            sessions[request["id"]] = nonce
+            return {"R": [point_to_hex(Rij) for Rij in nonce.R]}
+        if kind == "sign":
+            nonce = sessions.pop(request["id"], None)
+            if nonce is None:
+                raise ValueError('The session has no nonce.')
+            r_list = nonce.consume()
+            return {"s": bytes_from_int(self.partial_sign(request, r_list)).hex()}
+        raise ValueError('Unknown request type.')
+
+    # Second round: si = c*ai*di + SUM(ri,j * b^j)
+    def partial_sign(self, request: dict, r_list: list) -> int:
+        msg = bytes.fromhex(request["msg"])
+        if len(msg) != 32:
+            raise ValueError('The message must be a 32-byte array.')
+        pubkeys = tuple(request["pubkeys"])
+        ctx = self._contexts.get(pubkeys)
+        if ctx is None:
+            ctx = KeyAggContext.from_pubkeys(list(pubkeys))
+            self._contexts = {pubkeys: ctx}
+        ai = ctx.coefficient(ctx.index(self.pubkey))
+        Rj_list = [point_from_hex(h) for h in request["R"]]
+        if len(Rj_list) != NU:
+            raise ValueError('The session needs %d aggregate nonces.' % NU)
+        R, b_powers = aggregate_nonce(ctx, Rj_list, msg)
+        if not has_even_y(R):
+            r_list = [n - r for r in r_list]
+        c = int_from_bytes(tagged_hash("BIP0340/challenge", bytes_from_point(R) + ctx.X_bytes + msg)) % n
+        return (c * ai * self.d + sum(r * bj for r, bj in zip(r_list, b_powers))) % n
+
+
+# Connection of the coordinator to one signer, matching responses to
+# requests by session id so that requests can be pipelined
+class _Connection:
+    def __init__(self, address: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.address = address
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.listener = asyncio.create_task(self._listen())
+
+    async def request(self, message: dict, timeout: float) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message["id"]] = future
+        self.writer.write((json.dumps(message) + "\n").encode())
+        try:
+            await self.writer.drain()
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError('The signer %s did not answer in time.' % self.address)
+        finally:
+            self.pending.pop(message["id"], None)
+        if "error" in response:
+            raise RuntimeError('The signer %s failed: %s' % (self.address, response["error"]))
+        return response
+
+    async def _listen(self) -> None:
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.get(response.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError('The signer %s closed the connection.' % self.address))
+
+    async def close(self) -> None:
+        self.writer.close()
+        self.listener.cancel()
+        try:
+            await self.listener
+        except asyncio.CancelledError:
+            pass
+
+
+# Coordinator: runs the two rounds of every session on all the signers at
+# the same time, each round waiting at most timeout seconds, and any
+# number of sessions at once over the same connections. When a signature
+# fails, the signers that sent wrong partial signatures are added to
+# faulty, to be left out of the next signer set.
+class Coordinator:
+    def __init__(self, addresses: list, timeout: float = 10.0):
+        if not addresses:
+            raise ValueError('At least one signer is needed.')
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        self.ctx = None
+        self.pubkeys = None
+        self.faulty = set()
+        self._connections = []
+        self._next_id = 0
+
+    # Connect to every signer, retrying until timeout (signers may still be starting)
+    async def connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+
+        async def connect_one(address: str) -> _Connection:
+            while True:
+                try:
+                    return _Connection(address, *await open_connection(address))
+                except OSError:
+                    if loop.time() > deadline:
+                        raise RuntimeError('The signer %s cannot be reached.' % address)
+                    await asyncio.sleep(0.1)
+
+        self._connections = await asyncio.gather(*(connect_one(a) for a in self.addresses))
+        try:
+            hello = await self._round({"type": "hello"})
+        except Exception:
+            await self.close()
+            raise
+        self.pubkeys = [r["pubkey"] for r in hello]
+        self.ctx = KeyAggContext.from_pubkeys(self.pubkeys)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.close() for c in self._connections))
+        self._connections = []
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    # Send the same request to every signer at once, the answers are in signers order
+    async def _round(self, message: dict) -> list:
+        if "id" not in message:
+            self._next_id += 1
+            message = dict(message, id=self._next_id)
+        return await asyncio.gather(*(c.request(message, self.timeout) for c in self._connections))
+
+    # Sign a 32-byte message, returns the signature and the aggregate public key
+    async def sign(self, msg: bytes) -> tuple:
+        if len(msg) != 32:
+            raise ValueError('The message must be a 32-byte array.')
+        if self.ctx is None:
+            raise RuntimeError('The coordinator is not connected.')
+        self._next_id += 1
+        session = self._next_id
+
+        # First round: Rj = R1,j + ... + Rn,j
+        nonces = await self._round({"id": session, "type": "nonce"})
+        R_lists = [self._nonce_points(address, response) for address, response in zip(self.addresses, nonces)]
+        Rj_list = [None] * NU
+        for R_list in R_lists:
+            for j, Rij in enumerate(R_list):
+                Rj_list[j] = point_add(Rj_list[j], Rij)
+        if None in Rj_list:
+            raise RuntimeError('An aggregate nonce is the point at infinity, the session is aborted.')
+        R, b_powers = aggregate_nonce(self.ctx, Rj_list, msg)
+
+        # Second round: s = s1 + ... + sn
+        partials = await self._round({"id": session, "type": "sign", "msg": msg.hex(),
+                                      "pubkeys": self.pubkeys, "R": [point_to_hex(Rj) for Rj in Rj_list]})
+        s_list = [self._partial_sig(address, response) for address, response in zip(self.addresses, partials)]
+        sig = bytes_from_point(R) + bytes_from_int(sum(s_list) % n)
+        if not self.ctx.verify(msg, sig):
+            # Find the signers whose partial signatures are wrong
+            c = int_from_bytes(tagged_hash("BIP0340/challenge", bytes_from_point(R) + self.ctx.X_bytes + msg)) % n
+            valid = musig_partial_verify(self.ctx, s_list, R_lists, c, b_powers, not has_even_y(R))
+            faulty = [a for a, ok in zip(self.addresses, valid) if not ok]
+            self.faulty.update(faulty)
+            raise RuntimeError('The created signature does not pass verification, faulty signers: %s' % faulty)
+        return sig, self.ctx.X_bytes
+
+    # Points of a first round answer, a signer sending anything but NU
+    # valid points is faulty
+    def _nonce_points(self, address: str, response: dict) -> list:
+        try:
+            R_list = response["R"]
+            if not isinstance(R_list, list) or len(R_list) != NU:
+                raise ValueError('%d nonces are needed.' % NU)
+            return [point_from_hex(h) for h in R_list]
+        except (KeyError, TypeError, ValueError) as e:
+            self.faulty.add(address)
+            raise RuntimeError('The signer %s sent invalid nonces: %s' % (address, e))
+
+    # Scalar of a second round answer
+    def _partial_sig(self, address: str, response: dict) -> int:
+        try:
+            s = bytes.fromhex(response["s"])
+            if len(s) != 32:
+                raise ValueError('The partial signature must be a 32-byte array.')
+            return int_from_bytes(s)
+        except (KeyError, TypeError, ValueError) as e:
+            self.faulty.add(address)
+            raise RuntimeError('The signer %s sent an invalid partial signature: %s' % (address, e))
+
+    # Sign many messages, with their sessions pipelined
+    async def sign_many(self, msgs: list) -> list:
+        return await asyncio.gather(*(self.sign(msg) for msg in msgs))
+
+
+async def run_signer(privateKey: str, address: str, nonce_file: Optional[str]) -> None:
+    signer = SignerServer(privateKey, nonce_file=nonce_file)
+    server = await start_server(signer.handle, address)
+    print("[i] Signer", signer.pubkey.hex(), "listening on", address, flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        signer.close()
+
+
+async def run_coordinator(addresses: list, messages: list, timeout: float) -> None:
+    async with Coordinator(addresses, timeout) as coordinator:
+        digests = [sha256(m.encode()) for m in messages]
+        for M, (sig, X) in zip(digests, await coordinator.sign_many(digests)):
+            print("> Message =", M.hex())
+            print("> Signature =", sig.hex())
+        print("> Public aggregate=", coordinator.ctx.X_bytes.hex())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='MuSig2 signing between a coordinator and signer processes, each holding only its own key')
+    sub = parser.add_subparsers(dest="command", required=True)
+    signer = sub.add_parser("signer", help="Run the signer of one keypair of users.json")
+    signer.add_argument('-i', '--index', type=int, required=True, help='Index of the keypair of users.json to use')
+    signer.add_argument('-a', '--address', type=str, required=True, help='Address to listen on, host:port or unix:/path')
+    signer.add_argument('--nonce-file', type=str, help='File where the precomputed nonces are kept across restarts')
+    coordinator = sub.add_parser("coordinator", help="Sign messages with running signers")
+    coordinator.add_argument('-s', '--signers', type=str, required=True, help='Comma separated signer addresses')
+    coordinator.add_argument('-m', '--message', type=str, action='append', required=True, help='Message to be signed (can be repeated)')
+    coordinator.add_argument('-t', '--timeout', type=float, default=10.0, help='Seconds to wait for each round')
+    local = sub.add_parser("local", help="Start one signer process per keypair of users.json on this machine and sign")
+    local.add_argument('-m', '--message', type=str, action='append', required=True, help='Message to be signed (can be repeated)')
+    local.add_argument('-t', '--timeout', type=float, default=10.0, help='Seconds to wait for each round')
+    args = parser.parse_args()
+
+    try:
+        users = json.load(open("users.json", "r"))["users"]
+    except Exception:
+        print_fails("[e] Error. File nonexistent, create it with create_keypair.py")
+        sys.exit(2)
+
+    try:
+        if args.command == "signer":
+            if args.index < 0 or args.index >= len(users):
+                raise RuntimeError("Index is out of range")
+            # Only this signer's key is kept
+            privateKey = users[args.index]["privateKey"]
+            del users
+            asyncio.run(run_signer(privateKey, args.address, args.nonce_file))
+        elif args.command == "coordinator":
+            asyncio.run(run_coordinator(args.signers.split(","), args.message, args.timeout))
+        else:
+            directory = tempfile.mkdtemp()
+            addresses = ["unix:" + os.path.join(directory, "signer%d.sock" % i) for i in range(len(users))]
+            processes = [subprocess.Popen([sys.executable, __file__, "signer", "-i", str(i), "-a", a])
+                         for i, a in enumerate(addresses)]
+            try:
+                asyncio.run(run_coordinator(addresses, args.message, args.timeout))
+            finally:
+                for process in processes:
+                    process.terminate()
+                    process.wait()
+                shutil.rmtree(directory, ignore_errors=True)
+            print_success("[i] Signed with", len(users), "signer processes")
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print_fails("[e] Exception:", e)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
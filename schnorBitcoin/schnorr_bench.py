@@ -0,0 +1,166 @@
+import argparse, contextlib, io, json, os, platform, sys, time
+from utils import print_fails, print_success
+from schnorr_lib import n, sha256, bytes_from_int, int_from_bytes, pubkey_gen_from_int, \
+    schnorr_sign, schnorr_verify, schnorr_batch_verify, schnorr_musig_sign, schnorr_musig2_sign, \
+    set_sig_cache_size, field_backend
+from generate_p2rt_address import generate_p2tr_address
+
+
+# Get a random private key as an int
+def random_key() -> int:
+    return int_from_bytes(os.urandom(32)) % (n - 1) + 1
+
+
+# Get the q-quantile of a sorted list of samples
+def percentile(samples: list, q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+# Run fn until it has run at least min_runs times and for at least min_time
+# seconds; ops is the number of operations done by one call of fn
+def measure(fn, min_time: float, min_runs: int, ops: int = 1) -> dict:
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < min_runs or time.perf_counter() - start < min_time:
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    total = sum(samples)
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "ops_per_sec": len(samples) * ops / total,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p90_ms": percentile(samples, 0.90) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+# Call fn with its prints (MuSig signing is verbose) discarded
+def quiet(fn):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+# Build the benchmarks as (name, function, operations per call); with only,
+# just the benchmarks whose name contains it, and only their fixtures are built
+def benchmarks(signers: list, batch_sizes: list, only: str = None) -> list:
+    def selected(name: str) -> bool:
+        return not only or only in name
+
+    key = random_key()
+    key_hex = bytes_from_int(key).hex()
+    pubkey = pubkey_gen_from_int(key)
+    msg = sha256(b'benchmark')
+    sig = schnorr_sign(msg, key_hex)
+
+    benches = [
+        ("keygen", lambda: pubkey_gen_from_int(random_key()), 1),
+        ("schnorr_sign", lambda: schnorr_sign(msg, key_hex), 1),
+        ("schnorr_verify", lambda: schnorr_verify(msg, pubkey, sig), 1),
+    ]
+
+    for size in batch_sizes:
+        name = "schnorr_batch_verify_%d" % size
+        if not selected(name):
+            continue
+        items = []
+        for i in range(size):
+            k = random_key()
+            m = os.urandom(32)
+            items.append((m, pubkey_gen_from_int(k), schnorr_sign(m, bytes_from_int(k).hex())))
+        benches.append((name, lambda items=items: schnorr_batch_verify(items), size))
+
+    for count in signers:
+        if not (selected("schnorr_musig_sign_%d" % count) or selected("schnorr_musig2_sign_%d" % count)):
+            continue
+        users = [{"privateKey": bytes_from_int(random_key()).hex()} for i in range(count)]
+        benches.append(("schnorr_musig_sign_%d" % count,
+                        quiet(lambda users=users: schnorr_musig_sign(msg, users)), 1))
+        benches.append(("schnorr_musig2_sign_%d" % count,
+                        quiet(lambda users=users: schnorr_musig2_sign(msg, users)), 1))
+
+    benches.append(("bech32m_encode", lambda: generate_p2tr_address(pubkey.hex(), network='testnet'), 1))
+
+    sighash = sighash_benchmark() if selected("sighash") else None
+    if sighash is not None:
+        benches.append(("sighash", sighash, 1))
+    return [bench for bench in benches if selected(bench[0])]
+
+
+# Sighash computation of a one-input transaction, as done in send_bitcoin.py
+# (needs bitcoinlib, None if it is not installed)
+def sighash_benchmark():
+    try:
+        from bitcoinlib.transactions import Transaction
+    except ImportError:
+        return None
+    tx = Transaction(network='testnet')
+    tx.add_input(prev_txid=bytes(32), output_n=0, value=100000)
+    tx.add_output(90000, generate_p2tr_address(pubkey_gen_from_int(random_key()).hex(), network='testnet'))
+    return tx.signature_hash
+
+
+# Compare ops/sec with a baseline, returns the benchmarks that regressed
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    slower = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            slower.append((name, base["ops_per_sec"], result["ops_per_sec"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measures the throughput and the latency of schnorr_lib and compares them with a baseline')
+    parser.add_argument('-o', '--output', type=str, default="bench_results.json", help='JSON file where the results are written')
+    parser.add_argument('-b', '--baseline', type=str, help='JSON results of a previous run, the run fails if a benchmark is slower')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline (default 0.2, i.e. 20%%)')
+    parser.add_argument('--signers', type=str, default="2,10,100,1000", help='Comma separated numbers of MuSig signers')
+    parser.add_argument('--batch', type=str, default="10,100,1000", help='Comma separated batch verification sizes')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Minimum time spent in each benchmark in seconds')
+    parser.add_argument('--min-runs', type=int, default=3, help='Minimum number of runs of each benchmark')
+    parser.add_argument('-k', '--only', type=str, help='Only run the benchmarks whose name contains this string')
+    args = parser.parse_args()
+
+    signers = [int(v) for v in args.signers.split(",") if v]
+    batch_sizes = [int(v) for v in args.batch.split(",") if v]
+
+    # Every verification must do the work, not hit the signature cache
+    set_sig_cache_size(0)
+
+    results = {}
+    for name, fn, ops in benchmarks(signers, batch_sizes, args.only):
+        result = measure(fn, args.min_time, args.min_runs, ops)
+        results[name] = result
+        print("%-32s %12.1f ops/s   p50 %9.3f ms   p90 %9.3f ms   p99 %9.3f ms" % (
+            name, result["ops_per_sec"], result["p50_ms"], result["p90_ms"], result["p99_ms"]))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "field_backend": field_backend(),
+            "results": results,
+        }, f, indent=4)
+    print("[i] Results written to", args.output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        slower = regressions(results, baseline, args.tolerance)
+        for name, before, after in slower:
+            print_fails("[e] Regression: %s %.1f -> %.1f ops/s" % (name, before, after))
+        if slower:
+            sys.exit(1)
+        print_success("[i] No regression against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
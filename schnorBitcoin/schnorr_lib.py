@@ -1,7 +1,29 @@
 from typing import Tuple, Optional
 from binascii import unhexlify
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import functools
 import hashlib
+import mmap
 import os
+import random
+import struct
+import tempfile
+import threading
+import time
+import warnings
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
 
 # Elliptic curve parameters
 p = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
@@ -14,6 +36,218 @@ G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
 Point = Tuple[int, int]
 
 
+# Field arithmetic backends. Each backend provides mul, sqr, inv and sqrt
+# modulo p (sqrt returns the candidate root x^((p+1)/4), callers check it).
+# The pure-Python backend is the reference; an installed accelerator such
+# as gmpy2 is only used if it agrees with it on the self-test below.
+# Inversions and square roots go through the selected backend; the point
+# formulas keep inline products, where a call per operation would cost
+# more than it saves.
+class FieldBackend:
+    __slots__ = ("name", "mul", "sqr", "inv", "sqrt")
+
+    def __init__(self, name: str, mul, sqr, inv, sqrt):
+        self.name = name
+        self.mul = mul
+        self.sqr = sqr
+        self.inv = inv
+        self.sqrt = sqrt
+
+
+_PYTHON_BACKEND = FieldBackend(
+    "python",
+    lambda a, b: (a * b) % p,
+    lambda a: (a * a) % p,
+    lambda a: pow(a, -1, p),
+    lambda a: pow(a, (p + 1) // 4, p))
+
+_FIELD_BACKENDS = {"python": _PYTHON_BACKEND}
+
+if gmpy2 is not None:
+    _GMPY2_P = gmpy2.mpz(p)
+    _GMPY2_SQRT_EXP = gmpy2.mpz((p + 1) // 4)
+    _FIELD_BACKENDS["gmpy2"] = FieldBackend(
+        "gmpy2",
+        lambda a, b: int(gmpy2.mpz(a) * b % _GMPY2_P),
+        lambda a: int(gmpy2.square(gmpy2.mpz(a)) % _GMPY2_P),
+        lambda a: int(gmpy2.invert(a, _GMPY2_P)),
+        lambda a: int(gmpy2.powmod(a, _GMPY2_SQRT_EXP, _GMPY2_P)))
+
+_FIELD_BACKEND = _PYTHON_BACKEND
+_field_inv = _PYTHON_BACKEND.inv
+_field_sqrt = _PYTHON_BACKEND.sqrt
+
+
+# Values from the BIP340 test vectors of schnorr_test.py used by the
+# self-test: secret key, public key x, message and signature R_x and s
+_SELF_TEST_VALUES = (
+    0xB7E151628AED2A6ABF7158809CF4F3C762E7160F38B4DA56A784D9045190CFEF,
+    0xDFF1D77F2A671C5F36183726DB2341BE58FEAE1DA2DECED843240F7B502BA659,
+    0x243F6A8885A308D313198A2E03707344A4093822299F31D0082EFA98EC4E6C89,
+    0x0E12B8C520948A776753A96F21ABD7FDC2D7D0C0DDC90851BE17B04E75EF86A4,
+    0x7EF0DA46C4DC4D0D1BCB8668C2CE16C54C7C23A6716EDE303AF86774917CF928,
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798)
+
+
+# Cross-check a backend against the pure-Python reference
+def _self_test_backend(backend: FieldBackend) -> bool:
+    ref = _PYTHON_BACKEND
+    try:
+        for a in _SELF_TEST_VALUES:
+            for b in _SELF_TEST_VALUES:
+                if backend.mul(a, b) != ref.mul(a, b):
+                    return False
+            y_sq = (a * a * a + 7) % p
+            if (backend.sqr(a) != ref.sqr(a) or backend.inv(a) != ref.inv(a)
+                    or backend.sqrt(y_sq) != ref.sqrt(y_sq)):
+                return False
+    except Exception:
+        return False
+    return True
+
+
+# Register a field backend, it is only accepted if it passes the self-test
+def register_field_backend(backend: FieldBackend) -> None:
+    if not _self_test_backend(backend):
+        raise ValueError('The field backend %s does not pass the self-test.' % backend.name)
+    _FIELD_BACKENDS[backend.name] = backend
+
+
+# Select the field backend used for inversions and square roots
+def set_field_backend(name: str) -> None:
+    global _FIELD_BACKEND, _field_inv, _field_sqrt
+    if name not in _FIELD_BACKENDS:
+        raise ValueError('Unknown field backend %s, available: %s' % (name, ", ".join(_FIELD_BACKENDS)))
+    backend = _FIELD_BACKENDS[name]
+    _FIELD_BACKEND = backend
+    _field_inv = backend.inv
+    _field_sqrt = backend.sqrt
+
+
+# Get the name of the selected field backend
+def field_backend() -> str:
+    return _FIELD_BACKEND.name
+
+
+# Self-test at import: backends disagreeing with the reference are dropped,
+# then the accelerated one is selected unless SCHNORR_FIELD_BACKEND says otherwise
+for _name in [name for name in _FIELD_BACKENDS if name != "python"]:
+    if not _self_test_backend(_FIELD_BACKENDS[_name]):
+        del _FIELD_BACKENDS[_name]
+# (a backend that is not available falls back to the reference one with a warning)
+_name = os.environ.get("SCHNORR_FIELD_BACKEND") or ("gmpy2" if "gmpy2" in _FIELD_BACKENDS else "python")
+if _name not in _FIELD_BACKENDS:
+    warnings.warn('The field backend %s set in SCHNORR_FIELD_BACKEND is not available, using python.' % _name,
+                  RuntimeWarning)
+    _name = "python"
+set_field_backend(_name)
+
+
+# Opt-in instrumentation. When profiling is enabled, every high-level
+# operation (signing, verification, MuSig) runs in a span that counts the
+# field inversions, point additions and doublings, scalar multiplications,
+# lift_x and square roots and tagged hashes done on its behalf, and times
+# the call. Spans nest (the counts of an inner span are added to the outer
+# one) and are aggregated by name. When disabled, the hot paths only pay
+# one test of the _PROFILING flag.
+PROFILE_COUNTERS = ("field_inversions", "point_additions", "point_doublings",
+                    "scalar_multiplications", "lift_x", "sqrt", "tagged_hashes")
+_PROFILING = os.environ.get("SCHNORR_PROFILE", "") not in ("", "0")
+_PROFILE_LOCAL = threading.local()
+_PROFILE_STATS = {}
+_PROFILE_LOCK = threading.Lock()
+
+
+# Enable or disable the profiling spans and counters
+def enable_profiling(enabled: bool = True) -> None:
+    global _PROFILING
+    _PROFILING = enabled
+
+
+# Add k to a counter of the innermost span of this thread
+def _count(counter: str, k: int = 1) -> None:
+    stack = getattr(_PROFILE_LOCAL, "stack", None)
+    if stack:
+        stack[-1][counter] += k
+
+
+# Run the body of the with statement in a span named name, the span's
+# counts are yielded (None when profiling is disabled)
+@contextmanager
+def profile(name: str):
+    if not _PROFILING:
+        yield None
+        return
+    stack = getattr(_PROFILE_LOCAL, "stack", None)
+    if stack is None:
+        stack = _PROFILE_LOCAL.stack = []
+    counts = dict.fromkeys(PROFILE_COUNTERS, 0)
+    stack.append(counts)
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            for counter, k in counts.items():
+                stack[-1][counter] += k
+        with _PROFILE_LOCK:
+            stats = _PROFILE_STATS.get(name)
+            if stats is None:
+                stats = _PROFILE_STATS[name] = dict(dict.fromkeys(PROFILE_COUNTERS, 0),
+                                                    calls=0, seconds=0.0, max_seconds=0.0)
+            stats["calls"] += 1
+            stats["seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            for counter, k in counts.items():
+                stats[counter] += k
+
+
+# Decorator running every call of a function in a profiling span
+def profiled(name: Optional[str] = None):
+    def decorator(fn):
+        span = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _PROFILING:
+                return fn(*args, **kwargs)
+            with profile(span):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Get the aggregated spans: calls, total and max seconds and counters by name
+def profile_stats() -> dict:
+    with _PROFILE_LOCK:
+        return {name: dict(stats) for name, stats in _PROFILE_STATS.items()}
+
+
+# Forget the aggregated spans
+def reset_profile_stats() -> None:
+    with _PROFILE_LOCK:
+        _PROFILE_STATS.clear()
+
+
+# Export the aggregated spans in the Prometheus text exposition format
+def profile_prometheus() -> str:
+    stats = profile_stats()
+    metrics = [("calls", "schnorr_operation_calls_total", "Number of calls"),
+               ("seconds", "schnorr_operation_seconds_total", "Time spent in seconds"),
+               ("max_seconds", "schnorr_operation_max_seconds", "Slowest call in seconds")]
+    metrics += [(counter, "schnorr_%s_total" % counter, counter.replace("_", " ").capitalize())
+                for counter in PROFILE_COUNTERS]
+    lines = []
+    for key, metric, help_text in metrics:
+        lines.append("# HELP %s %s" % (metric, help_text))
+        lines.append("# TYPE %s %s" % (metric, "gauge" if key == "max_seconds" else "counter"))
+        for name in sorted(stats):
+            lines.append('%s{operation="%s"} %s' % (metric, name, stats[name][key]))
+    return "\n".join(lines) + "\n"
+
+
 # Get bytes from an int
 def bytes_from_int(a: int) -> bytes:
     return a.to_bytes(32, byteorder="big")
@@ -57,31 +291,717 @@ def point_add(P1: Optional[Point], P2: Optional[Point]) -> Optional[Point]:
         return P1
     if (x(P1) == x(P2)) and (y(P1) != y(P2)):
         return None
+    if _PROFILING:
+        _count("field_inversions")
+        _count("point_doublings" if P1 == P2 else "point_additions")
     if P1 == P2:
-        lam = (3 * x(P1) * x(P1) * pow(2 * y(P1), p - 2, p)) % p
+        lam = (3 * x(P1) * x(P1) * _field_inv(2 * y(P1))) % p
     else:
-        lam = ((y(P2) - y(P1)) * pow(x(P2) - x(P1), p - 2, p)) % p
+        lam = ((y(P2) - y(P1)) * _field_inv(x(P2) - x(P1))) % p
     x3 = (lam * lam - x(P1) - x(P2)) % p
     return x3, (lam * (x(P1) - x3) - y(P1)) % p
 
 
 # Point multiplication
 def point_mul(P: Optional[Point], d: int) -> Optional[Point]:
+    return _from_jacobian(_point_mul_jacobian(P, d))
+
+
+# Internally points are kept in Jacobian coordinates (X, Y, Z), which
+# stand for the affine point (X / Z^2, Y / Z^3). This avoids a modular
+# inversion on every addition and doubling: only the final conversion
+# back to affine coordinates needs one. The point at infinity is None.
+JacobianPoint = Tuple[int, int, int]
+
+
+# Convert an affine point to Jacobian coordinates
+def _to_jacobian(P: Optional[Point]) -> Optional[JacobianPoint]:
+    if P is None:
+        return None
+    return P[0], P[1], 1
+
+
+# Convert a Jacobian point back to affine coordinates (one inversion)
+def _from_jacobian(P: Optional[JacobianPoint]) -> Optional[Point]:
+    if P is None:
+        return None
+    X1, Y1, Z1 = P
+    if _PROFILING:
+        _count("field_inversions")
+    z_inv = _field_inv(Z1)
+    z_inv2 = (z_inv * z_inv) % p
+    return (X1 * z_inv2) % p, (Y1 * z_inv2 * z_inv) % p
+
+
+# Invert a list of non-zero field elements with a single inversion
+# (Montgomery's trick): prefix products forward, one inverse, then unwind
+def _batch_inv(values: list) -> list:
+    prefix = []
+    acc = 1
+    for v in values:
+        prefix.append(acc)
+        acc = (acc * v) % p
+    if _PROFILING:
+        _count("field_inversions")
+    acc_inv = _field_inv(acc)
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        inverses[i] = (acc_inv * prefix[i]) % p
+        acc_inv = (acc_inv * values[i]) % p
+    return inverses
+
+
+# Convert many Jacobian points to affine coordinates with a single inversion
+def batch_normalize(points: list) -> list:
+    z_invs = iter(_batch_inv([P[2] for P in points if P is not None]))
+    affine = []
+    for P in points:
+        if P is None:
+            affine.append(None)
+            continue
+        z_inv = next(z_invs)
+        z_inv2 = (z_inv * z_inv) % p
+        affine.append(((P[0] * z_inv2) % p, (P[1] * z_inv2 * z_inv) % p))
+    return affine
+
+
+# Jacobian point doubling (a = 0, dbl-2009-l)
+def _jacobian_double(P: Optional[JacobianPoint]) -> Optional[JacobianPoint]:
+    if P is None:
+        return None
+    X1, Y1, Z1 = P
+    if Y1 == 0:
+        return None
+    if _PROFILING:
+        _count("point_doublings")
+    YY = (Y1 * Y1) % p
+    S = (4 * X1 * YY) % p
+    M = (3 * X1 * X1) % p
+    X3 = (M * M - 2 * S) % p
+    Y3 = (M * (S - X3) - 8 * YY * YY) % p
+    Z3 = (2 * Y1 * Z1) % p
+    return X3, Y3, Z3
+
+
+# Jacobian point addition (add-2007-bl without the a = 0 shortcuts)
+def _jacobian_add(P1: Optional[JacobianPoint], P2: Optional[JacobianPoint]) -> Optional[JacobianPoint]:
+    if P1 is None:
+        return P2
+    if P2 is None:
+        return P1
+    if _PROFILING:
+        _count("point_additions")
+    X1, Y1, Z1 = P1
+    X2, Y2, Z2 = P2
+    Z1Z1 = (Z1 * Z1) % p
+    Z2Z2 = (Z2 * Z2) % p
+    U1 = (X1 * Z2Z2) % p
+    U2 = (X2 * Z1Z1) % p
+    S1 = (Y1 * Z2 * Z2Z2) % p
+    S2 = (Y2 * Z1 * Z1Z1) % p
+    if U1 == U2:
+        if S1 != S2:
+            return None
+        return _jacobian_double(P1)
+    H = (U2 - U1) % p
+    R = (S2 - S1) % p
+    HH = (H * H) % p
+    HHH = (H * HH) % p
+    V = (U1 * HH) % p
+    X3 = (R * R - HHH - 2 * V) % p
+    Y3 = (R * (V - X3) - S1 * HHH) % p
+    Z3 = (Z1 * Z2 * H) % p
+    return X3, Y3, Z3
+
+
+# Mixed addition of a Jacobian point and an affine point (Z2 = 1)
+def _jacobian_add_affine(P1: Optional[JacobianPoint], P2: Optional[Point]) -> Optional[JacobianPoint]:
+    if P2 is None:
+        return P1
+    if P1 is None:
+        return P2[0], P2[1], 1
+    if _PROFILING:
+        _count("point_additions")
+    X1, Y1, Z1 = P1
+    x2, y2 = P2
+    Z1Z1 = (Z1 * Z1) % p
+    U2 = (x2 * Z1Z1) % p
+    S2 = (y2 * Z1 * Z1Z1) % p
+    if X1 == U2:
+        if Y1 != S2:
+            return None
+        return _jacobian_double(P1)
+    H = (U2 - X1) % p
+    R = (S2 - Y1) % p
+    HH = (H * H) % p
+    HHH = (H * HH) % p
+    V = (X1 * HH) % p
+    X3 = (R * R - HHH - 2 * V) % p
+    Y3 = (R * (V - X3) - Y1 * HHH) % p
+    Z3 = (Z1 * H) % p
+    return X3, Y3, Z3
+
+
+# Point multiplication returning a Jacobian point (left-to-right double-and-add)
+def _point_mul_jacobian(P: Optional[Point], d: int) -> Optional[JacobianPoint]:
+    if P is None:
+        return None
+    if P == G:
+        return _point_mul_G_jacobian(d)
+    if _GLV_ENABLED:
+        return _point_mul_glv_jacobian(P, d)
+    if _PROFILING:
+        _count("scalar_multiplications")
+    return _point_mul_plain_jacobian(P, d)
+
+
+# Plain double-and-add d*P, without any precomputation table
+def _point_mul_plain_jacobian(P: Point, d: int) -> Optional[JacobianPoint]:
+    d = d % n
+    R = None
+    for bit in bin(d)[2:]:
+        R = _jacobian_double(R)
+        if bit == '1':
+            R = _jacobian_add_affine(R, P)
+    return R
+
+
+# Precomputation tables are cached on disk as a versioned, checksummed
+# binary file that is memory-mapped read-only, so every short-lived
+# script shares the same pages instead of rebuilding the table.
+# File layout: magic (8) | version (4) | count (4) | sha256(payload) (32)
+# followed by count affine points stored as 32-byte x || 32-byte y.
+_TABLE_MAGIC = b'SCHNTBL\x00'
+_TABLE_VERSION = 1
+_TABLE_HEADER_SIZE = 48
+_CACHE_DIR = os.environ.get(
+    "SCHNORR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "schnorBitcoin"))
+
+
+# Set the directory of the table cache, None (or "") disables it
+def set_cache_dir(path: Optional[str]) -> None:
+    global _CACHE_DIR, _G_TABLE, _G_ODD_TABLE, _G_PHI_ODD_TABLE
+    _CACHE_DIR = path
+    _G_TABLE = None
+    _G_ODD_TABLE = None
+    _G_PHI_ODD_TABLE = None
+
+
+# Read-only table of affine points backed by bytes or by a memory map
+class _PointTable:
+    __slots__ = ("buf", "count")
+
+    def __init__(self, buf, count: int):
+        self.buf = buf
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> Point:
+        off = _TABLE_HEADER_SIZE + 64 * i
+        buf = self.buf
+        return int_from_bytes(buf[off:off + 32]), int_from_bytes(buf[off + 32:off + 64])
+
+
+# Serialize a list of affine points to the table file format
+def _encode_table(points: list) -> bytes:
+    payload = b''.join(bytes_from_int(P[0]) + bytes_from_int(P[1]) for P in points)
+    header = _TABLE_MAGIC + struct.pack(">II", _TABLE_VERSION, len(points)) + sha256(payload)
+    return header + payload
+
+
+# Check the header and the checksum of a serialized table, return its size
+def _check_table(buf) -> Optional[int]:
+    if len(buf) < _TABLE_HEADER_SIZE or buf[0:8] != _TABLE_MAGIC:
+        return None
+    version, count = struct.unpack(">II", buf[8:16])
+    if version != _TABLE_VERSION or len(buf) != _TABLE_HEADER_SIZE + 64 * count:
+        return None
+    if sha256(buf[_TABLE_HEADER_SIZE:]) != buf[16:48]:
+        return None
+    return count
+
+
+# Memory-map a cached table file, None if it is missing or invalid
+def _map_table(path: str) -> Optional[_PointTable]:
+    try:
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    count = _check_table(buf)
+    if count is None:
+        buf.close()
+        return None
+    return _PointTable(buf, count)
+
+
+# Get a precomputation table by name: from the cache if present and valid,
+# otherwise build it and store it atomically for the next process.
+# expected holds (index, point) pairs the table must contain: the checksum
+# only detects corruption, a stale or planted file with a correct checksum
+# is caught by these entries and replaced.
+def _load_table(name: str, build, expected: list) -> _PointTable:
+    path = None
+    if _CACHE_DIR:
+        path = os.path.join(_CACHE_DIR, "%s-v%d.tbl" % (name, _TABLE_VERSION))
+        table = _map_table(path)
+        if table is not None:
+            if all(i < len(table) and table[i] == P for i, P in expected):
+                return table
+            table.buf.close()
+    points = build()
+    data = _encode_table(points)
+    if path is not None:
+        tmp = None
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+            tmp = None
+            table = _map_table(path)
+            if table is not None and len(table) == len(points):
+                return table
+        except OSError:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+    return _PointTable(data, len(points))
+
+
+# Fixed-base multiplication for the generator G.
+# The table holds j * 2^(w*i) * G for every w-bit window position i and
+# every non-zero window value j, so k*G takes one mixed addition per
+# window of k and no doublings. It is loaded (or built) on first use.
+_G_WINDOW = 4
+_G_TABLE = None
+
+
+# Build the fixed-base table for G, row i holds 1..2^w-1 times 2^(w*i) * G
+def _build_G_table() -> list:
+    table = []
+    base = _to_jacobian(G)
+    for i in range((256 + _G_WINDOW - 1) // _G_WINDOW):
+        acc = None
+        for j in range(1, 1 << _G_WINDOW):
+            acc = _jacobian_add(acc, base)
+            table.append(acc)
+        base = _jacobian_add(acc, base)
+    return batch_normalize(table)
+
+
+# Get the fixed-base table for G, loading or building it if needed
+def _get_G_table() -> _PointTable:
+    global _G_TABLE
+    if _G_TABLE is None:
+        rows = (256 + _G_WINDOW - 1) // _G_WINDOW
+        last = (1 << _G_WINDOW) - 1
+        _G_TABLE = _load_table("G-w%d" % _G_WINDOW, _build_G_table, [
+            (0, G),
+            (rows * last - 1, _from_jacobian(_point_mul_plain_jacobian(G, last << (_G_WINDOW * (rows - 1))))),
+        ])
+    return _G_TABLE
+
+
+# Fixed-base multiplication d*G returning a Jacobian point
+def _point_mul_G_jacobian(d: int) -> Optional[JacobianPoint]:
+    if _PROFILING:
+        _count("scalar_multiplications")
+    table = _get_G_table()
+    d = d % n
+    row = (1 << _G_WINDOW) - 1
+    R = None
+    i = -1
+    while d:
+        j = d & row
+        if j:
+            R = _jacobian_add_affine(R, table[i + j])
+        d >>= _G_WINDOW
+        i += row
+    return R
+
+
+# Fixed-base multiplication d*G
+def point_mul_G(d: int) -> Optional[Point]:
+    return _from_jacobian(_point_mul_G_jacobian(d))
+
+
+# Width-w non-adjacent form of d, least significant digit first.
+# Non-zero digits are odd, lie in (-2^(w-1), 2^(w-1)) and are separated
+# by at least w-1 zeros.
+def _wnaf(d: int, w: int) -> list:
+    naf = []
+    full = 1 << w
+    half = full >> 1
+    while d:
+        if d & 1:
+            z = d & (full - 1)
+            if z >= half:
+                z -= full
+            d -= z
+        else:
+            z = 0
+        naf.append(z)
+        d >>= 1
+    return naf
+
+
+# Odd multiples P, 3P, 5P, ..., (2*count - 1)P of an affine point
+def _odd_multiples(P: Point, count: int) -> list:
+    P2 = _jacobian_double(_to_jacobian(P))
+    acc = _to_jacobian(P)
+    multiples = [acc]
+    for i in range(1, count):
+        acc = _jacobian_add(acc, P2)
+        multiples.append(acc)
+    return batch_normalize(multiples)
+
+
+# Interleaved wNAF multiplication (Strauss / Shamir's trick).
+# Each term is a pair (wNAF digits, table of odd multiples) and the sum of
+# all the terms is computed over a single shared doubling chain.
+def _strauss_jacobian(terms: list) -> Optional[JacobianPoint]:
+    R = None
+    for i in range(max(len(naf) for naf, _ in terms) - 1, -1, -1):
+        R = _jacobian_double(R)
+        for naf, table in terms:
+            if i < len(naf):
+                z = naf[i]
+                if z > 0:
+                    R = _jacobian_add_affine(R, table[z >> 1])
+                elif z < 0:
+                    Q = table[(-z) >> 1]
+                    R = _jacobian_add_affine(R, (Q[0], p - Q[1]))
+    return R
+
+
+# Window widths of the wNAF representations: G uses a wide window backed
+# by a cached table of odd multiples, variable points a narrow one since
+# their table is built on every call
+_G_WNAF_WINDOW = 8
+_P_WNAF_WINDOW = 5
+_G_ODD_TABLE = None
+
+
+# Get the table of odd multiples of G, loading or building it if needed
+def _get_G_odd_table() -> _PointTable:
+    global _G_ODD_TABLE
+    if _G_ODD_TABLE is None:
+        count = 1 << (_G_WNAF_WINDOW - 2)
+        _G_ODD_TABLE = _load_table("G-odd-w%d" % _G_WNAF_WINDOW, lambda: _odd_multiples(G, count), [
+            (0, G),
+            (count - 1, _from_jacobian(_point_mul_plain_jacobian(G, 2 * count - 1))),
+        ])
+    return _G_ODD_TABLE
+
+
+# Double-scalar multiplication s*G + e*P returning a Jacobian point
+def _double_mul_jacobian(s: int, P: Point, e: int) -> Optional[JacobianPoint]:
+    if _PROFILING:
+        _count("scalar_multiplications", 2)
+    w, table, phi_table = _point_tables(P)
+    if _GLV_ENABLED:
+        terms = (_glv_terms(s, _get_G_odd_table(), _get_G_phi_odd_table(), _G_WNAF_WINDOW)
+                 + _glv_terms(e, table, phi_table, w))
+    else:
+        terms = [(_wnaf(s % n, _G_WNAF_WINDOW), _get_G_odd_table()),
+                 (_wnaf(e % n, w), table)]
+    return _strauss_jacobian(terms)
+
+
+# GLV endomorphism: on secp256k1 phi(x, y) = (beta*x, y) equals the
+# multiplication by lambda, so d*P = d1*P + d2*phi(P) where
+# d = d1 + d2*lambda mod n and d1, d2 have about 128 bits each.
+# This halves the doubling chain of every variable-base multiplication.
+_GLV_BETA = 0x7AE96A2B657C07106E64479EAC3434E99CF0497512F58995C1396C28719501EE
+_GLV_LAMBDA = 0x5363AD4CC05C30E0A5261C028812645A122E22EA20816678DF02967C1B23BD72
+# Short basis of the lattice {(a, b) : a + b*lambda = 0 mod n}
+_GLV_A1 = 0x3086D221A7D46BCDE86C90E49284EB15
+_GLV_B1 = -0xE4437ED6010E88286F547FA90ABFE4C3
+_GLV_A2 = 0x114CA50F7A8E2F3F657C1108D9D44CFD8
+_GLV_B2 = 0x3086D221A7D46BCDE86C90E49284EB15
+_GLV_ENABLED = True
+_G_PHI_ODD_TABLE = None
+
+
+# Enable or disable the GLV path of variable-base multiplications
+def set_glv(enabled: bool) -> None:
+    global _GLV_ENABLED
+    _GLV_ENABLED = enabled
+
+
+# Split d into (d1, d2) such that d = d1 + d2*lambda mod n, |d1|, |d2| < 2^128
+def _glv_split(d: int) -> Tuple[int, int]:
+    c1 = (_GLV_B2 * d + n // 2) // n
+    c2 = (-_GLV_B1 * d + n // 2) // n
+    d1 = d - c1 * _GLV_A1 - c2 * _GLV_A2
+    d2 = -c1 * _GLV_B1 - c2 * _GLV_B2
+    return d1, d2
+
+
+# Apply the endomorphism to every point of a table of multiples
+def _phi_table(table) -> list:
+    return [((_GLV_BETA * Q[0]) % p, Q[1]) for Q in (table[i] for i in range(len(table)))]
+
+
+# wNAF digits of a possibly negative scalar
+def _signed_wnaf(d: int, w: int) -> list:
+    if d < 0:
+        return [-z for z in _wnaf(-d, w)]
+    return _wnaf(d, w)
+
+
+# Strauss terms of d*P split with the endomorphism, given the odd
+# multiples of P and of phi(P)
+def _glv_terms(d: int, table, phi_table, w: int) -> list:
+    d1, d2 = _glv_split(d % n)
+    return [(_signed_wnaf(d1, w), table), (_signed_wnaf(d2, w), phi_table)]
+
+
+# Get the table of odd multiples of phi(G), loading or building it if needed
+def _get_G_phi_odd_table() -> _PointTable:
+    global _G_PHI_ODD_TABLE
+    if _G_PHI_ODD_TABLE is None:
+        G_odd = _get_G_odd_table()
+        _G_PHI_ODD_TABLE = _load_table("G-phi-odd-w%d" % _G_WNAF_WINDOW, lambda: _phi_table(G_odd), [
+            (i, ((_GLV_BETA * G_odd[i][0]) % p, G_odd[i][1])) for i in (0, len(G_odd) - 1)
+        ])
+    return _G_PHI_ODD_TABLE
+
+
+# Variable-base multiplication d*P using the endomorphism, as a Jacobian point
+def _point_mul_glv_jacobian(P: Point, d: int) -> Optional[JacobianPoint]:
+    if _PROFILING:
+        _count("scalar_multiplications")
+    w, table, phi_table = _point_tables(P)
+    return _strauss_jacobian(_glv_terms(d, table, phi_table, w))
+
+
+# Hot public keys: for registered keys a wide-window table of odd multiples
+# of P (and of phi(P)) is built once and kept, so e*P in verification costs
+# about as much as the fixed-base s*G. Tables are stored in the compact
+# table format and evicted least recently used beyond max_bytes.
+_HOT_WNAF_WINDOW = 8
+
+
+class _HotKeys:
+    __slots__ = ("max_bytes", "size", "_tables", "_lock")
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, P: Point) -> Optional[tuple]:
+        with self._lock:
+            tables = self._tables.get(P)
+            if tables is not None:
+                self._tables.move_to_end(P)
+            return tables
+
+    def add(self, P: Point) -> None:
+        if self.get(P) is not None:
+            return
+        multiples = _odd_multiples(P, 1 << (_HOT_WNAF_WINDOW - 2))
+        table = _PointTable(_encode_table(multiples), len(multiples))
+        phi_table = _PointTable(_encode_table(_phi_table(multiples)), len(multiples))
+        with self._lock:
+            if P not in self._tables:
+                self._tables[P] = (_HOT_WNAF_WINDOW, table, phi_table)
+                self.size += len(table.buf) + len(phi_table.buf)
+            self._evict()
+
+    def remove(self, P: Point) -> None:
+        with self._lock:
+            tables = self._tables.pop(P, None)
+            if tables is not None:
+                self.size -= len(tables[1].buf) + len(tables[2].buf)
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._tables and self.size > self.max_bytes:
+            _, tables = self._tables.popitem(last=False)
+            self.size -= len(tables[1].buf) + len(tables[2].buf)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._tables), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+_HOT_KEYS = _HotKeys(16 * 1024 * 1024)
+
+
+# Register a 32-byte x-only public key as hot
+def register_hot_pubkey(pubkey: bytes) -> None:
+    P = lift_x_even_y_cached(pubkey)
+    if P is None:
+        raise ValueError('The public key is not a valid x coordinate.')
+    _HOT_KEYS.add(P)
+
+
+# Drop the precomputed table of a hot public key
+def unregister_hot_pubkey(pubkey: bytes) -> None:
+    P = lift_x_even_y_cached(pubkey)
+    if P is not None:
+        _HOT_KEYS.remove(P)
+
+
+# Set the memory cap (in bytes) of the hot public key tables
+def set_hot_pubkey_memory(max_bytes: int) -> None:
+    _HOT_KEYS.resize(max_bytes)
+
+
+# Get the number of hot public keys and the memory used by their tables
+def hot_pubkey_stats() -> dict:
+    return _HOT_KEYS.stats()
+
+
+# Window width and tables of odd multiples of P and phi(P) for a variable
+# base: the retained ones of a hot key, or small ones built for this call.
+# The phi(P) table is only built when GLV is enabled.
+def _point_tables(P: Point) -> tuple:
+    tables = _HOT_KEYS.get(P)
+    if tables is not None:
+        return tables
+    table = _odd_multiples(P, 1 << (_P_WNAF_WINDOW - 2))
+    return _P_WNAF_WINDOW, table, _phi_table(table) if _GLV_ENABLED else None
+
+
+# Multi-scalar multiplication sum(d_i * P_i) over a list of (d_i, P_i)
+# pairs, returning a Jacobian point. With GLV enabled every term is split
+# in two ~128-bit terms first. Few terms go through Strauss, many through
+# Pippenger's bucket method whose cost per term is almost independent of
+# the number of terms. The threshold counts the pairs given, before the
+# GLV split (a batch of 11 signatures is 23 pairs and still uses Strauss).
+_PIPPENGER_THRESHOLD = 24
+
+
+def _multi_mul_jacobian(pairs) -> Optional[JacobianPoint]:
+    pairs = [(d % n, P) for d, P in pairs if P is not None and d % n != 0]
+    if not pairs:
+        return None
+    # One scalar multiplication per pair, on both paths
+    if _PROFILING:
+        _count("scalar_multiplications", len(pairs))
+    if len(pairs) < _PIPPENGER_THRESHOLD:
+        return _strauss_jacobian(_strauss_terms(pairs))
+    terms = []
+    for d, P in pairs:
+        if _GLV_ENABLED:
+            d1, d2 = _glv_split(d)
+            terms.append((d1, P))
+            terms.append((d2, ((_GLV_BETA * P[0]) % p, P[1])))
+        else:
+            terms.append((d, P))
+    # Make every scalar positive by negating its point
+    terms = [(d, P) if d > 0 else (-d, (P[0], p - P[1])) for d, P in terms if d != 0]
+    if not terms:
+        return None
+    return _pippenger_jacobian(terms)
+
+
+# wNAF terms of (d, P) pairs for Strauss, using the cached tables of G and
+# of hot keys, and one table of odd multiples per other point
+def _strauss_terms(pairs: list) -> list:
+    terms = []
+    for d, P in pairs:
+        if P == G:
+            w, table = _G_WNAF_WINDOW, _get_G_odd_table()
+            phi_table = _get_G_phi_odd_table() if _GLV_ENABLED else None
+        else:
+            w, table, phi_table = _point_tables(P)
+        if _GLV_ENABLED:
+            terms += _glv_terms(d, table, phi_table, w)
+        else:
+            terms.append((_wnaf(d, w), table))
+    return terms
+
+
+# Pippenger's bucket method for positive scalars and affine points.
+# The scalars are cut in c-bit windows; for each window, every point is
+# added to the bucket of its digit and the buckets are summed as
+# sum(j * B_j) with two running sums, from the top window down.
+def _pippenger_jacobian(terms: list) -> Optional[JacobianPoint]:
+    c = max(2, min(16, len(terms).bit_length() - 4))
+    mask = (1 << c) - 1
+    bits = max(d.bit_length() for d, _ in terms)
     R = None
-    for i in range(256):
-        if (d >> i) & 1:
-            R = point_add(R, P)
-        P = point_add(P, P)
+    for shift in range(((bits + c - 1) // c - 1) * c, -1, -c):
+        for _ in range(c):
+            R = _jacobian_double(R)
+        buckets = [None] * (mask + 1)
+        for d, P in terms:
+            j = (d >> shift) & mask
+            if j:
+                buckets[j] = _jacobian_add_affine(buckets[j], P)
+        running = None
+        window_sum = None
+        for j in range(mask, 0, -1):
+            running = _jacobian_add(running, buckets[j])
+            window_sum = _jacobian_add(window_sum, running)
+        R = _jacobian_add(R, window_sum)
     return R
 
 
-# Note: 
-# This implementation can be sped up by storing the midstate
-# after hashing tag_hash instead of rehashing it all the time
+# Tagged hashes: tag_hashed || tag_hashed is exactly one SHA256 block, so
+# the hash state after absorbing it (the midstate) is computed once per
+# tag and every call only copies it and hashes the message
+_TAGGED_HASHERS = {}
+
+
+# Get the midstate of a tag, computing it on first use
+def _tagged_hasher(tag: str):
+    h = _TAGGED_HASHERS.get(tag)
+    if h is None:
+        tag_hash = hashlib.sha256(tag.encode()).digest()
+        h = hashlib.sha256(tag_hash + tag_hash)
+        _TAGGED_HASHERS[tag] = h
+    return h
+
+
+# Tags used across the project (BIP340, BIP341 and MuSig)
+for _tag in ("BIP0340/aux", "BIP0340/nonce", "BIP0340/challenge",
+             "TapLeaf", "TapBranch", "TapTweak",
+             "KeyAgg list", "KeyAgg coefficient", "MuSig/aux", "MuSig/nonce", "MuSig/noncecoef",
+             "HalfAgg/randomizer"):
+    _tagged_hasher(_tag)
+
+
 # Get the hash digest of (tag_hashed || tag_hashed || message)
 def tagged_hash(tag: str, msg: bytes) -> bytes:
-    tag_hash = hashlib.sha256(tag.encode()).digest()
-    return hashlib.sha256(tag_hash + tag_hash + msg).digest()
+    if _PROFILING:
+        _count("tagged_hashes")
+    h = _tagged_hasher(tag).copy()
+    h.update(msg)
+    return h.digest()
+
+
+# Compute the BIP340 challenges e = hash(R || P || m) mod n for a list of
+# (R, P, m) triples of bytes, sharing one midstate lookup for all of them
+def challenge_hashes(triples) -> list:
+    copy = _tagged_hasher("BIP0340/challenge").copy
+    challenges = []
+    append = challenges.append
+    for R, P, m in triples:
+        h = copy()
+        h.update(R)
+        h.update(P)
+        h.update(m)
+        append(int.from_bytes(h.digest(), "big") % n)
+    if _PROFILING:
+        _count("tagged_hashes", len(challenges))
+    return challenges
 
 
 # Check if a point is at infinity
@@ -99,8 +1019,11 @@ def lift_x_square_y(b: bytes) -> Optional[Point]:
     x = int_from_bytes(b)
     if x >= p:
         return None
+    if _PROFILING:
+        _count("lift_x")
+        _count("sqrt")
     y_sq = (pow(x, 3, p) + 7) % p
-    y = pow(y_sq, (p + 1) // 4, p)
+    y = _field_sqrt(y_sq)
     if pow(y, 2, p) != y_sq:
         return None
     return x, y
@@ -114,6 +1037,64 @@ def lift_x_even_y(b: bytes) -> Optional[Point]:
         return x(P), y(P) if y(P) % 2 == 0 else p - y(P)
 
 
+# Bounded, thread-safe LRU cache of lifted public keys keyed by the 32-byte
+# x-only key, so the square root of lift_x is paid once per distinct key.
+# Invalid keys are cached too (as None).
+class _PubkeyCache:
+    __slots__ = ("maxsize", "hits", "misses", "_points", "_lock")
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._points = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pubkey: bytes) -> Optional[Point]:
+        with self._lock:
+            if pubkey in self._points:
+                self._points.move_to_end(pubkey)
+                self.hits += 1
+                return self._points[pubkey]
+            self.misses += 1
+        P = lift_x_even_y(pubkey)
+        with self._lock:
+            if self.maxsize > 0:
+                self._points[pubkey] = P
+                while len(self._points) > self.maxsize:
+                    self._points.popitem(last=False)
+        return P
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._points) > max(maxsize, 0):
+                self._points.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._points), "maxsize": self.maxsize}
+
+
+_PUBKEY_CACHE = _PubkeyCache(1024)
+
+
+# Get a public key point from its x-only bytes through the LRU cache
+def lift_x_even_y_cached(pubkey: bytes) -> Optional[Point]:
+    return _PUBKEY_CACHE.get(bytes(pubkey))
+
+
+# Set the maximum number of public keys kept in the cache, 0 disables it
+def set_pubkey_cache_size(maxsize: int) -> None:
+    _PUBKEY_CACHE.resize(maxsize)
+
+
+# Get the hits, misses, size and maximum size of the public key cache
+def pubkey_cache_stats() -> dict:
+    return _PUBKEY_CACHE.stats()
+
+
 # Get hash digest with SHA256
 def sha256(b: bytes) -> bytes:
     return hashlib.sha256(b).digest()
@@ -164,6 +1145,25 @@ def pubkey_point_gen_from_int(seckey: int) -> Point:
     return P
 
 
+# Generate public keys (as points) from a list of ints, normalizing all
+# of them with a single inversion
+def pubkey_points_gen_from_ints(seckeys: list) -> list:
+    points = batch_normalize([_point_mul_G_jacobian(seckey) for seckey in seckeys])
+    assert None not in points
+    return points
+
+
+# Get the points P, P + T, ..., P + (count-1)*T, with one mixed addition
+# per point and a single inversion for the whole sequence
+def point_sequence(P: Point, T: Point, count: int) -> list:
+    points = []
+    acc = _to_jacobian(P)
+    for _ in range(count):
+        points.append(acc)
+        acc = _jacobian_add_affine(acc, T)
+    return batch_normalize(points)
+
+
 # Generate auxiliary random of 32 bytes
 def get_aux_rand() -> bytes:
     return os.urandom(32)
@@ -189,102 +1189,589 @@ def get_bytes_s_from_sig(sig: bytes) -> int:
     return sig[32:64]
 
 
+# Schnorr signer bound to one private key. The key is parsed once and the
+# even-y normalized secret d, the public point P and its bytes are cached,
+# so each signature costs a single fixed-base multiplication plus the
+# verify-after-sign check selected by verify_policy:
+# "always", "sampled" (a random fraction sample_rate of the signatures) or "off"
+class Signer:
+    __slots__ = ("d", "d_bytes", "P", "pubkey", "verify_policy", "sample_rate")
+
+    def __init__(self, privateKey: str, verify_policy: str = "always", sample_rate: float = 0.01):
+        if verify_policy not in ("always", "sampled", "off"):
+            raise ValueError("The verify policy must be 'always', 'sampled' or 'off'.")
+        d0 = int_from_hex(privateKey)
+        if not (1 <= d0 <= n - 1):
+            raise ValueError(
+                'The secret key must be an integer in the range 1..n-1.')
+        P = point_mul(G, d0)
+        assert P is not None
+        if has_even_y(P):
+            self.d = d0
+            self.P = P
+        else:
+            self.d = n - d0
+            self.P = (x(P), p - y(P))
+        self.d_bytes = bytes_from_int(self.d)
+        self.pubkey = bytes_from_point(P)
+        self.verify_policy = verify_policy
+        self.sample_rate = sample_rate
+
+    # Nonce k0 for a message, before the parity of R is known
+    def _nonce(self, msg: bytes) -> int:
+        if len(msg) != 32:
+            raise ValueError('The message must be a 32-byte array.')
+        t = xor_bytes(self.d_bytes, tagged_hash("BIP0340/aux", get_aux_rand()))
+        k0 = int_from_bytes(tagged_hash("BIP0340/nonce", t + self.pubkey + msg)) % n
+        if k0 == 0:
+            raise RuntimeError('Failure. This happens only with negligible probability.')
+        return k0
+
+    # Whether the verify policy asks to check the next signature
+    def _should_verify(self) -> bool:
+        if self.verify_policy == "always":
+            return True
+        if self.verify_policy == "sampled":
+            return random.random() < self.sample_rate
+        return False
+
+    # Sign a 32-byte message
+    @profiled("Signer.sign")
+    def sign(self, msg: bytes) -> bytes:
+        k0 = self._nonce(msg)
+        R = point_mul_G(k0)
+        assert R is not None
+        k = n - k0 if not has_even_y(R) else k0
+        e = int_from_bytes(tagged_hash("BIP0340/challenge", bytes_from_point(R) + self.pubkey + msg)) % n
+        sig = bytes_from_point(R) + bytes_from_int((k + e * self.d) % n)
+        if self._should_verify() and not _schnorr_verify_point(msg, self.P, self.pubkey, sig):
+            raise RuntimeError('The created signature does not pass verification.')
+        return sig
+
+    # Sign a list of 32-byte messages: the nonce points are normalized with
+    # a single inversion, the challenges are hashed in bulk and the selected
+    # signatures are checked with one batch verification
+    @profiled("Signer.sign_many")
+    def sign_many(self, msgs: list) -> list:
+        nonces = [self._nonce(msg) for msg in msgs]
+        points = batch_normalize([_point_mul_G_jacobian(k0) for k0 in nonces])
+        ks = [k0 if has_even_y(R) else n - k0 for k0, R in zip(nonces, points)]
+        Rs = [bytes_from_point(R) for R in points]
+        challenges = challenge_hashes((R, self.pubkey, msg) for R, msg in zip(Rs, msgs))
+        sigs = [R + bytes_from_int((k + e * self.d) % n)
+                for R, k, e in zip(Rs, ks, challenges)]
+        checked = [(msg, self.pubkey, sig) for msg, sig in zip(msgs, sigs) if self._should_verify()]
+        if not all(schnorr_batch_verify(checked)):
+            raise RuntimeError('The created signature does not pass verification.')
+        return sigs
+
+
 # Generate Schnorr signature
+@profiled()
 def schnorr_sign(msg: bytes, privateKey: str) -> bytes:
     if len(msg) != 32:
         raise ValueError('The message must be a 32-byte array.')
-    d0 = int_from_hex(privateKey)
-    if not (1 <= d0 <= n - 1):
-        raise ValueError(
-            'The secret key must be an integer in the range 1..n-1.')
-    P = point_mul(G, d0)
-    assert P is not None
-    d = d0 if has_even_y(P) else n - d0
-    t = xor_bytes(bytes_from_int(d), tagged_hash("BIP0340/aux", get_aux_rand()))
-    k0 = int_from_bytes(tagged_hash("BIP0340/nonce", t + bytes_from_point(P) + msg)) % n
-    if k0 == 0:
-        raise RuntimeError('Failure. This happens only with negligible probability.')
-    R = point_mul(G, k0)
-    assert R is not None
-    k = n - k0 if not has_even_y(R) else k0
-    e = int_from_bytes(tagged_hash("BIP0340/challenge", bytes_from_point(R) + bytes_from_point(P) + msg)) % n
-    sig = bytes_from_point(R) + bytes_from_int((k + e * d) % n)
-    
-    if not schnorr_verify(msg, bytes_from_point(P), sig):
-        raise RuntimeError('The created signature does not pass verification.')
-    return sig
+    return Signer(privateKey).sign(msg)
+
+
+# Salted, bounded cache of valid signatures in the spirit of Bitcoin Core's
+# sigcache: only positive results are stored, as 128-bit salted hashes of
+# (msg, pubkey, sig) in a set, and a random entry is evicted when it is full.
+# The salt is random per process so entries cannot be targeted.
+class _SigCache:
+    __slots__ = ("max_entries", "hits", "misses", "_hasher", "_entries", "_order", "_lock")
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._hasher = hashlib.sha256(os.urandom(32))
+        self._entries = set()
+        self._order = []
+        self._lock = threading.Lock()
+
+    def _key(self, msg: bytes, pubkey: bytes, sig: bytes) -> int:
+        h = self._hasher.copy()
+        h.update(msg)
+        h.update(pubkey)
+        h.update(sig)
+        return int.from_bytes(h.digest()[:16], "big")
+
+    def contains(self, msg: bytes, pubkey: bytes, sig: bytes) -> bool:
+        key = self._key(msg, pubkey, sig)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, msg: bytes, pubkey: bytes, sig: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self._key(msg, pubkey, sig)
+        with self._lock:
+            if key in self._entries:
+                return
+            # The victim is one of the entries already there, never the new key
+            self._evict(self.max_entries - 1)
+            self._entries.add(key)
+            self._order.append(key)
+
+    # Drop random entries until at most size are left
+    def _evict(self, size: int) -> None:
+        order = self._order
+        while len(order) > max(size, 0):
+            i = random.randrange(len(order))
+            order[i], order[-1] = order[-1], order[i]
+            self._entries.discard(order.pop())
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict(max_entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "size": len(self._order), "max_entries": self.max_entries}
+
+
+_SIG_CACHE = _SigCache(100000)
+
+
+# Set the maximum number of signatures kept in the cache, 0 disables it
+def set_sig_cache_size(max_entries: int) -> None:
+    _SIG_CACHE.resize(max_entries)
+
+
+# Get the hits, misses, hit rate and size of the signature cache
+def sig_cache_stats() -> dict:
+    return _SIG_CACHE.stats()
 
 
 # Verify Schnorr signature
+@profiled()
 def schnorr_verify(msg: bytes, pubkey: bytes, sig: bytes) -> bool:
+    return _verify(msg, pubkey, sig, quiet=False)
+
+
+# schnorr_verify without the diagnostic prints, for the library paths
+# (batch fallback, verification pool) whose callers only use the result
+def _verify(msg: bytes, pubkey: bytes, sig: bytes, quiet: bool = True) -> bool:
     if len(msg) != 32:
         raise ValueError('The message must be a 32-byte array.')
     if len(pubkey) != 32:
         raise ValueError('The public key must be a 32-byte array.')
     if len(sig) != 64:
         raise ValueError('The signature must be a 64-byte array.')
-    P = lift_x_even_y(pubkey)
+    if _SIG_CACHE.contains(msg, pubkey, sig):
+        return True
+    if not _schnorr_verify_point(msg, lift_x_even_y_cached(pubkey), pubkey, sig, quiet):
+        return False
+    _SIG_CACHE.add(msg, pubkey, sig)
+    return True
+
+
+# Verify Schnorr signature given the already lifted public key point P
+def _schnorr_verify_point(msg: bytes, P: Optional[Point], pubkey: bytes, sig: bytes,
+                          quiet: bool = True) -> bool:
     r = get_int_R_from_sig(sig)
     s = get_int_s_from_sig(sig)
     if (P is None) or (r >= p) or (s >= n):
         return False
     e = int_from_bytes(tagged_hash("BIP0340/challenge", get_bytes_R_from_sig(sig) + pubkey + msg)) % n
-    R = point_add(point_mul(G, s), point_mul(P, n - e))
+    R = _from_jacobian(_double_mul_jacobian(s, P, n - e))
     if (R is None) or (not has_even_y(R)):
-        print("Please, recompute the sign. R is None or has even y")
+        if not quiet:
+            print("Please, recompute the sign. R is None or has even y")
         return False
     if x(R) != r:
-        print("There's something wrong")
+        if not quiet:
+            print("There's something wrong")
         return False
     return True
 
 
+# Verify many Schnorr signatures at once, items are (msg, pubkey, sig) triples.
+# BIP340 batch verification: with random a_1 = 1, a_2, ..., a_u check
+# (a_1*s_1 + ... + a_u*s_u)*G == sum(a_i*R_i) + sum(a_i*e_i*P_i) with one
+# multi-scalar multiplication. If the batch fails every item is verified
+# on its own to find the invalid ones. Returns one bool per item.
+@profiled()
+def schnorr_batch_verify(items: list) -> list:
+    items = list(items)
+    for msg, pubkey, sig in items:
+        if len(msg) != 32:
+            raise ValueError('The message must be a 32-byte array.')
+        if len(pubkey) != 32:
+            raise ValueError('The public key must be a 32-byte array.')
+        if len(sig) != 64:
+            raise ValueError('The signature must be a 64-byte array.')
+    results = [_SIG_CACHE.contains(msg, pubkey, sig) for msg, pubkey, sig in items]
+    pending = [i for i, cached in enumerate(results) if not cached]
+    for i, valid in zip(pending, _batch_verify([items[i] for i in pending])):
+        results[i] = valid
+    return results
+
+
+# Batch verification of items missing from the signature cache
+def _batch_verify(items: list) -> list:
+    if len(items) < 2:
+        return [_verify(msg, pubkey, sig) for msg, pubkey, sig in items]
+
+    challenges = challenge_hashes((get_bytes_R_from_sig(sig), pubkey, msg) for msg, pubkey, sig in items)
+    pairs = []
+    s_sum = 0
+    for i, (msg, pubkey, sig) in enumerate(items):
+        P = lift_x_even_y_cached(pubkey)
+        R = lift_x_even_y(get_bytes_R_from_sig(sig))
+        s = get_int_s_from_sig(sig)
+        if (P is None) or (R is None) or (s >= n):
+            break
+        e = challenges[i]
+        # 128-bit randomizers are enough for batch verification
+        a = 1 if i == 0 else 1 + int_from_bytes(os.urandom(16))
+        s_sum += a * s
+        pairs.append((a, R))
+        pairs.append((a * e, P))
+    else:
+        pairs.append((n - s_sum % n, G))
+        if _multi_mul_jacobian(pairs) is None:
+            for msg, pubkey, sig in items:
+                _SIG_CACHE.add(msg, pubkey, sig)
+            return [True] * len(items)
+    return [_verify(msg, pubkey, sig) for msg, pubkey, sig in items]
+
+
+# Half-aggregation of Schnorr signatures (cross-input aggregation draft):
+# n signatures (Ri, si) become R1 || ... || Rn || s with s = SUM(zi * si),
+# z1 = 1 and zi = hash_HalfAgg/randomizer(R1 || P1 || m1 || ... || Ri || Pi || mi).
+# The randomizers are computed with one running hash state.
+_HALF_AGG_MAX = 1 << 16
+
+
+# Get the randomizers z of the (R, pubkey, msg) triples following the
+# already aggregated ones, h is the running hash state and is updated
+def _half_agg_randomizers(h, first: int, triples) -> list:
+    zs = []
+    for i, (R, pubkey, msg) in enumerate(triples, first):
+        h.update(R)
+        h.update(pubkey)
+        h.update(msg)
+        zs.append(1 if i == 0 else int_from_bytes(h.digest()) % n)
+    return zs
+
+
+# Check the (msg, pubkey) pairs or (msg, pubkey, sig) triples given to half-aggregation
+def _half_agg_check(items: list, with_sig: bool) -> None:
+    for item in items:
+        if len(item[0]) != 32:
+            raise ValueError('The message must be a 32-byte array.')
+        if len(item[1]) != 32:
+            raise ValueError('The public key must be a 32-byte array.')
+        if with_sig and len(item[2]) != 64:
+            raise ValueError('The signature must be a 64-byte array.')
+
+
+# Half-aggregate (msg, pubkey, sig) triples into one (n+1)*32 bytes signature
+def schnorr_half_aggregate(items: list) -> bytes:
+    return schnorr_half_aggregate_inc(bytes(32), [], items)
+
+
+# Add (msg, pubkey, sig) triples to the half-aggregate aggsig of the
+# (msg, pubkey) pairs aggregated, in order, so far
+def schnorr_half_aggregate_inc(aggsig: bytes, aggregated: list, items: list) -> bytes:
+    aggregated = list(aggregated)
+    items = list(items)
+    _half_agg_check(aggregated, False)
+    _half_agg_check(items, True)
+    v = len(aggregated)
+    if v + len(items) >= _HALF_AGG_MAX:
+        raise ValueError('Too many signatures to aggregate.')
+    if len(aggsig) != 32 * (v + 1):
+        raise ValueError('The aggregate signature must be a %d-byte array.' % (32 * (v + 1)))
+    s = int_from_bytes(aggsig[32 * v:])
+    if s >= n:
+        raise ValueError('The aggregate signature is invalid.')
+    h = _tagged_hasher("HalfAgg/randomizer").copy()
+    _half_agg_randomizers(h, 0, ((aggsig[32 * i:32 * (i + 1)], pubkey, msg) for i, (msg, pubkey) in enumerate(aggregated)))
+    zs = _half_agg_randomizers(h, v, ((sig[:32], pubkey, msg) for msg, pubkey, sig in items))
+    for z, (msg, pubkey, sig) in zip(zs, items):
+        si = get_int_s_from_sig(sig)
+        if si >= n:
+            raise ValueError('The signature is invalid.')
+        s = (s + z * si) % n
+    return aggsig[:32 * v] + b''.join(sig[:32] for _, _, sig in items) + bytes_from_int(s)
+
+
+# Verify a half-aggregate signature of (msg, pubkey) pairs:
+# s*G == SUM(zi * (Ri + ei*Pi)) with one multi-scalar multiplication
+@profiled()
+def schnorr_half_aggregate_verify(items: list, aggsig: bytes) -> bool:
+    items = list(items)
+    _half_agg_check(items, False)
+    u = len(items)
+    if u >= _HALF_AGG_MAX:
+        raise ValueError('Too many signatures to aggregate.')
+    if len(aggsig) != 32 * (u + 1):
+        raise ValueError('The aggregate signature must be a %d-byte array.' % (32 * (u + 1)))
+    triples = [(aggsig[32 * i:32 * (i + 1)], pubkey, msg) for i, (msg, pubkey) in enumerate(items)]
+    s = int_from_bytes(aggsig[32 * u:])
+    if s >= n:
+        return False
+    zs = _half_agg_randomizers(_tagged_hasher("HalfAgg/randomizer").copy(), 0, triples)
+    challenges = challenge_hashes(triples)
+    pairs = [(n - s, G)]
+    for z, e, (R_bytes, pubkey, msg) in zip(zs, challenges, triples):
+        P = lift_x_even_y_cached(pubkey)
+        R = lift_x_even_y(R_bytes)
+        if (P is None) or (R is None):
+            return False
+        pairs.append((z, R))
+        pairs.append((z * e, P))
+    return _multi_mul_jacobian(pairs) is None
+
+
+# Worker process setup of a VerifyPool: same settings as the parent, and
+# every precomputation table is loaded before the first chunk arrives
+def _verify_pool_init(cache_dir: Optional[str], glv: bool, backend: str, hot_pubkeys: list) -> None:
+    set_cache_dir(cache_dir)
+    set_glv(glv)
+    set_field_backend(backend)
+    _get_G_table()
+    _get_G_odd_table()
+    _get_G_phi_odd_table()
+    for pubkey in hot_pubkeys:
+        register_hot_pubkey(pubkey)
+
+
+# Verify one chunk of (msg, pubkey, sig) triples in a worker process
+def _verify_pool_chunk(items: list, batch: bool) -> list:
+    if batch:
+        return schnorr_batch_verify(items)
+    return [_verify(msg, pubkey, sig) for msg, pubkey, sig in items]
+
+
+# Pool of worker processes verifying signatures on every CPU core.
+# Items are split in chunks of chunk_size, each chunk is verified with
+# batch verification (or one by one with batch=False) and the results come
+# back in the order of the items. hot_pubkeys are registered in every worker.
+class VerifyPool:
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 256,
+                 batch: bool = True, hot_pubkeys: list = ()):
+        if chunk_size < 1:
+            raise ValueError('The chunk size must be at least 1.')
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.batch = batch
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_verify_pool_init,
+            initargs=(_CACHE_DIR, _GLV_ENABLED, _FIELD_BACKEND.name, [bytes(pk) for pk in hot_pubkeys]))
+        # Start the workers now so that their warm-up is off the first request
+        for future in [self._executor.submit(_verify_pool_chunk, [], batch) for _ in range(self.workers)]:
+            future.result()
+
+    # Verify a list of (msg, pubkey, sig) triples, one bool per item
+    def verify(self, items) -> list:
+        items = list(items)
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        results = []
+        for chunk_results in self._executor.map(_verify_pool_chunk, chunks, [self.batch] * len(chunks)):
+            results.extend(chunk_results)
+        return results
+
+    # Verify a single signature in a worker process
+    def verify_one(self, msg: bytes, pubkey: bytes, sig: bytes) -> bool:
+        return self._executor.submit(_verify_pool_chunk, [(msg, pubkey, sig)], False).result()[0]
+
+    # Stop the workers, pending chunks are finished unless cancel_futures is set
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel_futures=exc_type is not None)
+
+
+# Private keys of users.json and their public points, each key negated
+# when its point has an odd y so that it matches the x-only public key
+# (as create_keypair.py does): all the MuSig signers use even-y keys
+def _musig_keys(users: list) -> Tuple[list, list]:
+    seckeys = []
+    for u in users:
+        di = int_from_hex(u["privateKey"])
+        if not (1 <= di <= n - 1):
+            raise ValueError('The secret key must be an integer in the range 1..n-1.')
+        seckeys.append(di)
+    points = pubkey_points_gen_from_ints(seckeys)
+    for i, P in enumerate(points):
+        if not has_even_y(P):
+            seckeys[i] = n - seckeys[i]
+            points[i] = (x(P), p - y(P))
+    return seckeys, points
+
+
+# MuSig key aggregation context, built once per signer set and reused for
+# every message: it caches the public keys (x-only bytes, in the given order
+# or sorted), L = h(P1 || ... || Pn), the coefficients ai = h(L || Pi),
+# the aggregate X~ = a1*P1 + ... + an*Pn and whether X~ has an odd y
+# (in which case every coefficient is negated when signing)
+class KeyAggContext:
+    __slots__ = ("points", "pubkeys", "L", "coefficients", "X", "X_bytes", "negated", "_index")
+
+    def __init__(self, points: list, sort: bool = False):
+        if not points:
+            raise ValueError('At least one public key is needed.')
+        if sort:
+            points = sorted(points, key=bytes_from_point)
+        self.points = list(points)
+        self.pubkeys = [bytes_from_point(P) for P in self.points]
+        self.L = sha256(b''.join(self.pubkeys))
+        self.coefficients = [int_from_bytes(sha256(self.L + pk)) % n for pk in self.pubkeys]
+        self.X = _from_jacobian(_multi_mul_jacobian(zip(self.coefficients, self.points)))
+        if self.X is None:
+            raise ValueError('The aggregate public key is the point at infinity.')
+        self.X_bytes = bytes_from_point(self.X)
+        self.negated = not has_even_y(self.X)
+        self._index = {pk: i for i, pk in enumerate(self.pubkeys)}
+
+    # Context from 32-byte x-only public keys (bytes or hex), lifted with
+    # even y as create_keypair.py normalizes them
+    @classmethod
+    def from_pubkeys(cls, pubkeys: list, sort: bool = False) -> "KeyAggContext":
+        points = []
+        for pk in pubkeys:
+            P = lift_x_even_y_cached(bytes_from_hex(pk) if isinstance(pk, str) else bytes(pk))
+            if P is None:
+                raise ValueError('The public key is not a valid x coordinate.')
+            points.append(P)
+        return cls(points, sort)
+
+    # Context from the users of users.json, in their order, deriving the
+    # even-y public keys from the private keys (same X~ as from_pubkeys)
+    @classmethod
+    def from_users(cls, users: list) -> "KeyAggContext":
+        return cls(_musig_keys(users)[1])
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    # Position of a public key in the context
+    def index(self, pubkey: bytes) -> int:
+        if pubkey not in self._index:
+            raise ValueError('The public key is not part of the aggregate.')
+        return self._index[pubkey]
+
+    # Coefficient of signer i as used when signing (negated if X~ has odd y)
+    def coefficient(self, i: int) -> int:
+        return n - self.coefficients[i] if self.negated else self.coefficients[i]
+
+    # Check that users are the signers of this context, in the same order
+    def check_users(self, users: list) -> None:
+        if len(users) != len(self.points):
+            raise ValueError('The users do not match the key aggregation context.')
+        for u, pk in zip(users, self.pubkeys):
+            if "publicKey" in u and bytes_from_hex(u["publicKey"]) != pk:
+                raise ValueError('The users do not match the key aggregation context.')
+
+    # Verify an aggregate signature against X~
+    def verify(self, msg: bytes, sig: bytes) -> bool:
+        return _verify(msg, self.X_bytes, sig)
+
+
+# Verify the partial signatures si of a MuSig or MuSig2 session given
+# the public nonces Ri,j of every signer: si*G == Ri + c*ai*Pi, with
+# Ri = SUM(b^j * Ri,j) (b_powers is [1] for MuSig), negated if the
+# aggregate nonce has an odd y, and ai the signing coefficient of ctx.
+# All the signers are checked with one multi-scalar multiplication using
+# random weights; only if that fails each one is checked on its own, so
+# the result tells which signers misbehaved.
+def musig_partial_verify(ctx: KeyAggContext, partial_sigs: list, R_lists: list, c: int,
+                         b_powers: list = (1,), R_negated: bool = False) -> list:
+    if len(partial_sigs) != len(ctx) or len(R_lists) != len(ctx):
+        raise ValueError('There must be one partial signature and one nonce per signer.')
+
+    # Terms of z*(si*G - Ri - c*ai*Pi), without the si*G one
+    def terms(i: int, z: int) -> list:
+        pairs = []
+        for bj, Rij in zip(b_powers, R_lists[i]):
+            pairs.append((z * bj if R_negated else n - z * bj % n, Rij))
+        pairs.append((n - z * c * ctx.coefficient(i) % n, ctx.points[i]))
+        return pairs
+
+    if any(s >= n for s in partial_sigs):
+        return [s < n and _multi_mul_jacobian(terms(i, 1) + [(s, G)]) is None
+                for i, s in enumerate(partial_sigs)]
+    pairs = []
+    s_sum = 0
+    for i, s in enumerate(partial_sigs):
+        # 128-bit randomizers are enough for batch verification
+        z = 1 if i == 0 else 1 + int_from_bytes(os.urandom(16))
+        s_sum += z * s
+        pairs += terms(i, z)
+    pairs.append((s_sum, G))
+    if _multi_mul_jacobian(pairs) is None:
+        return [True] * len(partial_sigs)
+    return [_multi_mul_jacobian(terms(i, 1) + [(s, G)]) is None for i, s in enumerate(partial_sigs)]
+
+
+# Error raised when an aggregate signature fails, naming the signers
+# whose partial signatures are invalid
+def _musig_failure(valid: list) -> RuntimeError:
+    bad = [i for i, ok in enumerate(valid) if not ok]
+    return RuntimeError('The created signature does not pass verification (invalid partial signatures of users %s).' % bad)
+
+
 # Generate Schnorr MuSig signature
-def schnorr_musig_sign(msg: bytes, users: list) -> bytes:
+# (ctx can be a KeyAggContext of the users, built once for many messages)
+@profiled()
+def schnorr_musig_sign(msg: bytes, users: list, ctx: Optional[KeyAggContext] = None) -> bytes:
     if len(msg) != 32:
         raise ValueError('The message must be a 32-byte array.')
     
-    # Key aggregation (KeyAgg), L = h(P1 || ... || Pn)
-    L = b''
-    for u in users:
-        L += pubkey_gen_from_hex(u["privateKey"])
-    L = sha256(L)
+    # Key aggregation (KeyAgg), L = h(P1 || ... || Pn), ai = h(L||Pi)
+    # and X~ = X1 + ... + Xn, Xi = ai * Pi
+    seckeys, points = _musig_keys(users)
+    if ctx is None:
+        ctx = KeyAggContext(points)
+    ctx.check_users(users)
+    X = ctx.X
 
     Rsum = None
-    X = None
-    for u in users:
-        # Get private key di and public key Pi
-        di = int_from_hex(u["privateKey"])
-        if not (1 <= di <= n - 1):
-            raise ValueError('The secret key must be an integer in the range 1..n-1.')
-        Pi = pubkey_point_gen_from_int(di)
-        assert Pi is not None
+    Ri_list = []
+    for i, u in enumerate(users):
+        # Get private key di (even-y) and public key Pi
+        di = seckeys[i]
+        Pi_bytes = ctx.pubkeys[i]
         
         # KeyAggCoef
-        # ai = h(L||Pi)
-        ai = int_from_bytes(sha256(L + bytes_from_point(Pi)))
-        u["ai"] = ai
-
-        # Computation of X~
-        # X~ = X1 + ... + Xn, Xi = ai * Pi 
-        X = point_add(X, point_mul(Pi, ai))
+        u["ai"] = ctx.coefficients[i]
 
         # Random ki with tagged hash
         t = xor_bytes(bytes_from_int(di), tagged_hash("BIP0340/aux", get_aux_rand()))
-        ki = int_from_bytes(tagged_hash("BIP0340/nonce", t + bytes_from_point(Pi) + msg)) % n
+        ki = int_from_bytes(tagged_hash("BIP0340/nonce", t + Pi_bytes + msg)) % n
         if ki == 0:
             raise RuntimeError('Failure. This happens only with negligible probability.')
         
         # Ri = ki * G
-        Ri = point_mul(G, ki)
+        Ri = _point_mul_jacobian(G, ki)
         assert Ri is not None
         
         # Rsum = R1 + ... + Rn
-        Rsum = point_add(Rsum, Ri)       
+        Rsum = _jacobian_add(Rsum, Ri)       
         u["ki"] = ki
+        Ri_list.append(Ri)
+
+    # Back to affine coordinates once, after all the additions
+    Rsum = _from_jacobian(Rsum)
 
     # The aggregate public key X~ needs to be y-even
-    if not has_even_y(X):
+    if ctx.negated:
         for i, u in enumerate(users):
             users[i]["ai"] = n - u["ai"]
 
@@ -297,53 +1784,276 @@ def schnorr_musig_sign(msg: bytes, users: list) -> bytes:
     # c = hash( Rsum || X || M )
     c = int_from_bytes(tagged_hash("BIP0340/challenge", (bytes_from_point(Rsum) + bytes_from_point(X) + msg))) % n
 
-    sSum = 0
-    for u in users:
+    s_list = []
+    for i, u in enumerate(users):
         # Get private key di
-        di = int_from_hex(u["privateKey"])
+        di = seckeys[i]
         
         # sSum = s1 + ... + sn,  # si = ki + di * c * ai mod n
-        sSum += (di * c * u["ai"] + u["ki"]) % n
-    sSum = sSum % n
+        s_list.append((di * c * u["ai"] + u["ki"]) % n)
+    sSum = sum(s_list) % n
 
     signature_bytes = bytes_from_point(Rsum) + bytes_from_int(sSum)
 
-    if not schnorr_verify(msg, bytes_from_point(X), signature_bytes):
-        raise RuntimeError('The created signature does not pass verification.')
-    return signature_bytes, bytes_from_point(X)
+    if not ctx.verify(msg, signature_bytes):
+        R_lists = [[Ri] for Ri in batch_normalize(Ri_list)]
+        raise _musig_failure(musig_partial_verify(ctx, s_list, R_lists, c, R_negated=not has_even_y(Rsum)))
+    return signature_bytes, ctx.X_bytes
+
+
+# One precomputed MuSig2 first round nonce: the nu secret scalars ri,j
+# (kept in a bytearray so they can be overwritten) and the public Ri,j.
+# The scalars can be read only once, consume() erases them.
+class MuSig2Nonce:
+    __slots__ = ("_secret", "R")
+
+    def __init__(self, secret: bytearray, R: list):
+        self._secret = secret
+        self.R = R
+
+    @property
+    def used(self) -> bool:
+        return not any(self._secret)
+
+    # Get the secret scalars and erase them
+    def consume(self) -> list:
+        if self.used:
+            raise RuntimeError('The nonce has already been used.')
+        r_list = [int_from_bytes(self._secret[i:i + 32]) for i in range(0, len(self._secret), 32)]
+        self.erase()
+        return r_list
+
+    def erase(self) -> None:
+        for i in range(len(self._secret)):
+            self._secret[i] = 0
+
+
+# Pool of MuSig2 nonces of one signer, computed ahead of the message so
+# that online signing is only scalar arithmetic and aggregation.
+# A background thread keeps up to size nonces ready. With a path, the
+# unused nonces are saved there (readable only by the owner) and
+# reloaded on restart; a nonce is removed from the file before it is
+# handed out, so a crash can lose nonces but never reuse one. The file
+# is locked while the pool is open, a second pool on it is refused.
+_NONCE_MAGIC = b"SCHNNCE\0"
+_NONCE_HEADER = struct.Struct(">8s32sI")
+
+
+# Take an exclusive lock on path (created if needed) without waiting,
+# returns the descriptor holding it
+def _lock_file(path: str) -> int:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        raise RuntimeError('The nonce file is in use by another nonce pool.')
+    return fd
+
+
+def _unlock_file(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+class NoncePool:
+    def __init__(self, privateKey: str, size: int = 64, nu: int = 2,
+                 path: Optional[str] = None, background: bool = True):
+        if size < 1:
+            raise ValueError('The pool size must be at least 1.')
+        d = int_from_hex(privateKey)
+        if not (1 <= d <= n - 1):
+            raise ValueError('The secret key must be an integer in the range 1..n-1.')
+        self.d_bytes = bytes_from_int(d)
+        self.pubkey = bytes_from_point(point_mul_G(d))
+        self.size = size
+        self.nu = nu
+        self.path = path
+        self._nonces = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self._lock_fd = None
+        if path is not None:
+            # The file is owned by this pool until close(), another pool on
+            # the same file would hand out the same nonces
+            self._lock_fd = _lock_file(path + ".lock")
+            try:
+                if os.path.exists(path):
+                    self._load()
+            except Exception:
+                _unlock_file(self._lock_fd)
+                self._lock_fd = None
+                raise
+        if background:
+            self._thread = threading.Thread(target=self._refill, name="NoncePool", daemon=True)
+            self._thread.start()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._nonces)
+
+    # Get an unused nonce, computed on the spot if the pool is empty
+    def take(self) -> MuSig2Nonce:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('The nonce pool is closed.')
+            if not self._nonces:
+                self._nonces.extend(self._generate(1))
+            nonce = self._nonces.popleft()
+            try:
+                self._save()
+            except OSError:
+                nonce.erase()
+                raise RuntimeError('The nonce pool could not be saved, the nonce was discarded.')
+            self._cond.notify_all()
+        return nonce
+
+    # Stop the background thread and erase the nonces kept in memory
+    # (the saved ones stay in the file for the next run)
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._cond:
+            for nonce in self._nonces:
+                nonce.erase()
+            self._nonces.clear()
+            if self._lock_fd is not None:
+                _unlock_file(self._lock_fd)
+                self._lock_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Compute count nonces, ri,j = h(d xor h(aux) || P || rand) and Ri,j = ri,j * G
+    def _generate(self, count: int) -> list:
+        secrets = []
+        for _ in range(count):
+            secret = bytearray()
+            while len(secret) < 32 * self.nu:
+                t = xor_bytes(self.d_bytes, tagged_hash("MuSig/aux", get_aux_rand()))
+                r = int_from_bytes(tagged_hash("MuSig/nonce", t + self.pubkey + get_aux_rand())) % n
+                if r != 0:
+                    secret += bytes_from_int(r)
+            secrets.append(secret)
+        return self._with_points(secrets)
+
+    # Build the nonces of the secrets, computing the points in one batch
+    def _with_points(self, secrets: list) -> list:
+        R = batch_normalize([_point_mul_G_jacobian(int_from_bytes(s[i:i + 32]))
+                             for s in secrets for i in range(0, len(s), 32)])
+        return [MuSig2Nonce(s, R[k * self.nu:(k + 1) * self.nu]) for k, s in enumerate(secrets)]
+
+    def _refill(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and len(self._nonces) >= self.size:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                missing = self.size - len(self._nonces)
+            nonces = self._generate(min(missing, 16))
+            with self._cond:
+                if self._closed:
+                    for nonce in nonces:
+                        nonce.erase()
+                    return
+                self._nonces.extend(nonces)
+                try:
+                    self._save()
+                except OSError:
+                    pass
+                self._cond.notify_all()
+
+    def _load(self) -> None:
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if len(data) < _NONCE_HEADER.size:
+            raise ValueError('The nonce file is corrupted.')
+        magic, pubkey, nu = _NONCE_HEADER.unpack_from(data)
+        if magic != _NONCE_MAGIC or nu != self.nu:
+            raise ValueError('The nonce file is corrupted.')
+        if pubkey != self.pubkey:
+            raise ValueError('The nonce file belongs to another key.')
+        record = 32 * self.nu
+        if (len(data) - _NONCE_HEADER.size) % record:
+            raise ValueError('The nonce file is corrupted.')
+        secrets = [bytearray(data[i:i + record]) for i in range(_NONCE_HEADER.size, len(data), record)]
+        self._nonces.extend(self._with_points(secrets))
+
+    # Write the unused nonces, replacing the file atomically
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_NONCE_HEADER.pack(_NONCE_MAGIC, self.pubkey, self.nu))
+                for nonce in self._nonces:
+                    f.write(nonce._secret)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except OSError:
+            os.unlink(tmp)
+            raise
 
 
 # Generate Schnorr MuSig2 signature
-def schnorr_musig2_sign(msg: bytes, users: list) -> bytes:
+# (ctx can be a KeyAggContext of the users, built once for many messages;
+# nonce_pools can give, in the users order, a NoncePool of each user whose
+# precomputed nonces replace the first signing round)
+@profiled()
+def schnorr_musig2_sign(msg: bytes, users: list, ctx: Optional[KeyAggContext] = None,
+                        nonce_pools: Optional[list] = None) -> bytes:
     if len(msg) != 32:
         raise ValueError('The message must be a 32-byte array.')
 
     nu = 2
 
-    # Key aggregation (KeyAgg), L = h(P1 || ... || Pn)
-    L = b''
-    for u in users:
-        L += pubkey_gen_from_hex(u["privateKey"])
-    L = sha256(L)
-    print("L: ", L)
-    
-    X = None
-    for u in users:
-        # Get private key di and public key Pi
-        di = int_from_hex(u["privateKey"])
-        if not (1 <= di <= n - 1):
-            raise ValueError('The secret key must be an integer in the range 1..n-1.')
-        Pi = pubkey_point_gen_from_int(di)
-        assert Pi is not None
+    # Key aggregation (KeyAgg), L = h(P1 || ... || Pn), ai = h(L||Pi)
+    # and X~ = X1 + ... + Xn, Xi = ai * Pi
+    seckeys, points = _musig_keys(users)
+    if ctx is None:
+        ctx = KeyAggContext(points)
+    ctx.check_users(users)
+    if nonce_pools is not None:
+        if len(nonce_pools) != len(users):
+            raise ValueError('There must be one nonce pool per user.')
+        for i, pool in enumerate(nonce_pools):
+            if pool.pubkey != ctx.pubkeys[i] or pool.nu != nu:
+                raise ValueError('The nonce pool does not belong to the user.')
+    print("L: ", ctx.L)
+    X = ctx.X
+
+    # Secret nonces ri,j of the users, kept here and never written to users
+    r_lists = []
+    for i, u in enumerate(users):
+        # Get private key di (even-y) and public key Pi
+        di = seckeys[i]
+        Pi_bytes = ctx.pubkeys[i]
 
         # KeyAggCoef
-        # ai = h(L||Pi)
-        ai = int_from_bytes(sha256(L + bytes_from_point(Pi)))
-        u["ai"] = ai
+        u["ai"] = ctx.coefficients[i]
 
-        # Computation of X~
-        # X~ = X1 + ... + Xn, Xi = ai * Pi 
-        X = point_add(X, point_mul(Pi, ai))
+        # First signing round done ahead with a precomputed nonce
+        if nonce_pools is not None:
+            nonce = nonce_pools[i].take()
+            r_lists.append(nonce.consume())
+            u["R_list"] = [_to_jacobian(Rij) for Rij in nonce.R]
+            continue
 
         # First signing round (Sign and SignAgg) 
         r_list = []
@@ -352,17 +2062,17 @@ def schnorr_musig2_sign(msg: bytes, users: list) -> bytes:
         for j in range(nu):
             # Random r with tagged hash
             t = xor_bytes(bytes_from_int(di), tagged_hash("BIP0340/aux", get_aux_rand()))
-            r = int_from_bytes(tagged_hash("BIP0340/nonce", t + bytes_from_point(Pi) + msg)) % n
+            r = int_from_bytes(tagged_hash("BIP0340/nonce", t + Pi_bytes + msg)) % n
             if r == 0:
                 raise RuntimeError('Failure. This happens only with negligible probability.')
         
             # Ri,j = ri,j * G (i represents the user)
-            Rij = point_mul(G, r)
+            Rij = _point_mul_jacobian(G, r)
             assert Rij is not None
 
             r_list.append(r)
             R_list.append(Rij)            
-        u["r_list"] = r_list
+        r_lists.append(r_list)
         u["R_list"] = R_list
 
     # SignAgg
@@ -373,7 +2083,8 @@ def schnorr_musig2_sign(msg: bytes, users: list) -> bytes:
     for j in range(nu):
         Rj_list.append(None)
         for u in users:
-            Rj_list[j] = point_add(Rj_list[j], u["R_list"][j])
+            Rj_list[j] = _jacobian_add(Rj_list[j], u["R_list"][j])
+    Rj_list = batch_normalize(Rj_list)
     
     # Second signing round (Sign', SignAgg', Sign'')
     # Sign'
@@ -383,53 +2094,52 @@ def schnorr_musig2_sign(msg: bytes, users: list) -> bytes:
 
     # b = h(R1 || ... || Rn || X || M)
     b = sha256(Rbytes + bytes_from_point(X) + msg)
+    b_powers = [pow(int_from_bytes(b), j, n) for j in range(nu)]
 
-    Rsum = None
-    for j, Rj in enumerate(Rj_list):
-        # Rsum = SUM (Rj * b^(j))  (Rsum is R in the paper) 
-        Rsum = point_add(Rsum, point_mul(Rj, int_from_bytes(b) ** j))
+    # Rsum = SUM (Rj * b^(j))  (Rsum is R in the paper) 
+    Rsum = _from_jacobian(_multi_mul_jacobian(zip(b_powers, Rj_list)))
     assert Rsum is not None   
 
     # The aggregate public key X~ needs to be y-even
-    if not has_even_y(X):
+    if ctx.negated:
         for i, u in enumerate(users):
             users[i]["ai"] = n - u["ai"]
 
     # If the aggregated nonce does not have an even Y
     # then negate  individual nonce scalars (and the aggregate nonce)
     if not has_even_y(Rsum):
-        for i, u in enumerate(users):
-            for j, r in enumerate(users[i]["r_list"]):
-                users[i]["r_list"][j] = n - users[i]["r_list"][j]
+        for i in range(len(users)):
+            r_lists[i] = [n - r for r in r_lists[i]]
 
     # c = hash( Rsum || X || M )
     c = int_from_bytes(tagged_hash("BIP0340/challenge", (bytes_from_point(Rsum) + bytes_from_point(X) + msg))) % n
 
     # SignAgg' step
-    sSum = 0
-    for u in users:
+    s_list = []
+    for i, u in enumerate(users):
         # Get private key di
-        di = int_from_hex(u["privateKey"])
+        di = seckeys[i]
         print("di: ", di, u["privateKey"])
         rb = 0 
         for j in range(nu):
-            rb += u["r_list"][j] * int_from_bytes(b)**j
+            rb += r_lists[i][j] * b_powers[j]
 
         # ssum = s1 + ... + sn, si = (c*ai*di + r) % n
-        sSum += (di * c * u["ai"]  + rb) % n
-    sSum = sSum % n
+        s_list.append((di * c * u["ai"]  + rb) % n)
+    sSum = sum(s_list) % n
 
     signature_bytes = bytes_from_point(Rsum) + bytes_from_int(sSum)   
      
-    if not schnorr_verify(msg, bytes_from_point(X), signature_bytes):
-        raise RuntimeError('The created signature does not pass verification.')
-    return signature_bytes, bytes_from_point(X)
-
-def compute_aggregate_public_key(public_keys):
-    public_keys.sort()  # Lexicographical sort
-    coefficients = compute_coefficients(public_keys)
-    PK_agg = sum(c * int_from_hex(pk) for c, pk in zip(coefficients, public_keys)) % p
-    return bytes_from_int(PK_agg)
+    if not ctx.verify(msg, signature_bytes):
+        R_lists = batch_normalize([Rij for u in users for Rij in u["R_list"]])
+        R_lists = [R_lists[i * nu:(i + 1) * nu] for i in range(len(users))]
+        raise _musig_failure(musig_partial_verify(ctx, s_list, R_lists, c, b_powers, not has_even_y(Rsum)))
+    return signature_bytes, ctx.X_bytes
+
+# Aggregate x-only public keys (hex) into the x-only key X~ = SUM(ai * Pi),
+# in the order given, as schnorr_musig_sign and schnorr_musig2_sign do
+def compute_aggregate_public_key(public_keys: list) -> bytes:
+    return KeyAggContext.from_pubkeys(public_keys).X_bytes
 
 def compute_coefficients(public_keys):
     L = sha256(b''.join([bytes_from_hex(pk) for pk in public_keys]))
@@ -166,6 +166,509 @@ else:
     print('   Actual signature:', sig_actual.hex().upper())
 
 
-
-
-
+# Cross-check the GLV multiplication path of schnorr_lib against the plain one
+import os
+import schnorr_lib
+
+glv_ok = True
+for i in range(16):
+    d = int_from_bytes(os.urandom(32)) % n
+    P = schnorr_lib.point_mul(G, int_from_bytes(os.urandom(32)) % n)
+    schnorr_lib.set_glv(True)
+    glv = schnorr_lib.point_mul(P, d)
+    schnorr_lib.set_glv(False)
+    plain = schnorr_lib.point_mul(P, d)
+    schnorr_lib.set_glv(True)
+    if glv != plain or glv != point_mul(P, d):
+        glv_ok = False
+        print('   GLV mismatch for scalar:', hex(d))
+
+if glv_ok:
+    print(' * Passed GLV test.')
+else:
+    print(' * Failed GLV test.')
+
+# Batch verification of schnorr_lib signatures, with one invalid item
+batch = []
+for i in range(20):
+    batch_key = int_from_bytes(os.urandom(32)) % n
+    batch_msg = os.urandom(32)
+    batch.append((batch_msg, schnorr_lib.pubkey_gen_from_int(batch_key),
+                  schnorr_lib.schnorr_sign(batch_msg, bytes_from_int(batch_key).hex())))
+batch_ok = schnorr_lib.schnorr_batch_verify(batch) == [True] * 20
+batch[5] = (batch[5][0], batch[5][1], batch[6][2])
+batch_ok = batch_ok and schnorr_lib.schnorr_batch_verify(batch) == [i != 5 for i in range(20)]
+
+if batch_ok:
+    print(' * Passed batch verification test.')
+else:
+    print(' * Failed batch verification test.')
+
+# MuSig2 signing with precomputed nonces, each nonce usable only once
+import contextlib, io
+
+musig_users = [{"privateKey": bytes_from_int(int_from_bytes(os.urandom(32)) % (n - 1) + 1).hex()} for i in range(3)]
+musig_pools = [schnorr_lib.NoncePool(u["privateKey"], size=4, background=False) for u in musig_users]
+musig_msg = os.urandom(32)
+with contextlib.redirect_stdout(io.StringIO()):
+    musig_sig, musig_X = schnorr_lib.schnorr_musig2_sign(musig_msg, musig_users, nonce_pools=musig_pools)
+nonce_ok = schnorr_lib.schnorr_verify(musig_msg, musig_X, musig_sig)
+# The secret nonces are not left in the users
+nonce_ok = nonce_ok and not any("r_list" in u for u in musig_users)
+used_nonce = musig_pools[0].take()
+used_nonce.consume()
+try:
+    used_nonce.consume()
+    nonce_ok = False
+except RuntimeError:
+    pass
+
+# A nonce file can be used by one pool at a time
+import tempfile
+nonce_file = os.path.join(tempfile.mkdtemp(), "nonces")
+with schnorr_lib.NoncePool(musig_users[0]["privateKey"], size=2, path=nonce_file, background=False) as nonce_pool:
+    nonce_pool.take()
+    try:
+        schnorr_lib.NoncePool(musig_users[0]["privateKey"], size=2, path=nonce_file, background=False)
+        nonce_ok = False
+    except RuntimeError:
+        pass
+schnorr_lib.NoncePool(musig_users[0]["privateKey"], size=2, path=nonce_file, background=False).close()
+
+if nonce_ok:
+    print(' * Passed MuSig2 nonce pool test.')
+else:
+    print(' * Failed MuSig2 nonce pool test.')
+
+# Partial signature verification points out the signer with a wrong si
+partial_ctx = schnorr_lib.KeyAggContext.from_users(musig_users)
+partial_k = [int_from_bytes(os.urandom(32)) % (n - 1) + 1 for u in musig_users]
+partial_R = [[schnorr_lib.point_mul_G(k)] for k in partial_k]
+partial_c = int_from_bytes(os.urandom(32)) % n
+partial_s = []
+for i, u in enumerate(musig_users):
+    partial_d = int_from_bytes(bytes.fromhex(u["privateKey"]))
+    if not has_even_y(point_mul(G, partial_d)):
+        partial_d = n - partial_d
+    partial_s.append((partial_k[i] + partial_c * partial_ctx.coefficient(i) * partial_d) % n)
+partial_ok = schnorr_lib.musig_partial_verify(partial_ctx, partial_s, partial_R, partial_c) == [True] * 3
+partial_s[1] = (partial_s[1] + 1) % n
+partial_ok = partial_ok and schnorr_lib.musig_partial_verify(partial_ctx, partial_s, partial_R, partial_c) == [True, False, True]
+
+if partial_ok:
+    print(' * Passed partial signature verification test.')
+else:
+    print(' * Failed partial signature verification test.')
+
+# Half-aggregation of the batch signatures, at once and incrementally
+halfagg_items = [item for i, item in enumerate(batch) if i != 5]
+halfagg_pairs = [(msg, pubkey) for msg, pubkey, sig in halfagg_items]
+halfagg_sig = schnorr_lib.schnorr_half_aggregate(halfagg_items)
+halfagg_ok = len(halfagg_sig) == 32 * (len(halfagg_items) + 1)
+halfagg_ok = halfagg_ok and schnorr_lib.schnorr_half_aggregate_verify(halfagg_pairs, halfagg_sig)
+halfagg_inc = schnorr_lib.schnorr_half_aggregate(halfagg_items[:7])
+halfagg_inc = schnorr_lib.schnorr_half_aggregate_inc(halfagg_inc, halfagg_pairs[:7], halfagg_items[7:])
+halfagg_ok = halfagg_ok and halfagg_inc == halfagg_sig
+halfagg_ok = halfagg_ok and not schnorr_lib.schnorr_half_aggregate_verify(halfagg_pairs[::-1], halfagg_sig)
+
+if halfagg_ok:
+    print(' * Passed half-aggregation test.')
+else:
+    print(' * Failed half-aggregation test.')
+
+# The aggregate key used for addresses is the one MuSig signatures verify
+# with, for private keys whose points have an even or an odd y
+agg_users = []
+agg_parities = set()
+while len(agg_users) < 3 or len(agg_parities) < 2:
+    agg_d = int_from_bytes(os.urandom(32)) % (n - 1) + 1
+    agg_parities.add(has_even_y(point_mul(G, agg_d)))
+    agg_users.append({"privateKey": bytes_from_int(agg_d).hex(),
+                      "publicKey": bytes_from_point(point_mul(G, agg_d)).hex()})
+agg_msg = os.urandom(32)
+agg_key = schnorr_lib.compute_aggregate_public_key([u["publicKey"] for u in agg_users])
+agg_ctx = schnorr_lib.KeyAggContext.from_pubkeys([u["publicKey"] for u in agg_users])
+agg_ok = agg_key == schnorr_lib.KeyAggContext.from_users(agg_users).X_bytes
+agg_ok = agg_ok and agg_key == schnorr_lib.schnorr_musig_sign(agg_msg, [dict(u) for u in agg_users])[1]
+agg_sig, agg_X = schnorr_lib.schnorr_musig_sign(agg_msg, [dict(u) for u in agg_users], agg_ctx)
+agg_ok = agg_ok and agg_X == agg_key and schnorr_lib.schnorr_verify(agg_msg, agg_key, agg_sig)
+with contextlib.redirect_stdout(io.StringIO()):
+    agg_ok = agg_ok and agg_key == schnorr_lib.schnorr_musig2_sign(agg_msg, [dict(u) for u in agg_users])[1]
+    agg_sig, agg_X = schnorr_lib.schnorr_musig2_sign(agg_msg, [dict(u) for u in agg_users], agg_ctx)
+agg_ok = agg_ok and agg_X == agg_key and schnorr_lib.schnorr_verify(agg_msg, agg_key, agg_sig)
+
+if agg_ok:
+    print(' * Passed aggregate public key test.')
+else:
+    print(' * Failed aggregate public key test.')
+
+# Address pool: an interrupted and resumed pool equals an uninterrupted one,
+# and every line matches the keys derived on their own
+import address_pool
+from generate_p2rt_address import generate_p2tr_address
+
+pool_dir = tempfile.mkdtemp()
+pool_master = int_from_bytes(os.urandom(32)) % (n - 1) + 1
+pool_full = os.path.join(pool_dir, "full.csv")
+pool_resumed = os.path.join(pool_dir, "resumed.csv")
+address_pool.generate_pool(pool_master, 50, pool_full, chunk_size=16)
+address_pool.generate_pool(pool_master, 20, pool_resumed, chunk_size=7)
+with open(pool_resumed, "a") as f:
+    f.write("20,0123")  # Line cut by an interruption
+address_pool.generate_pool(pool_master, 50, pool_resumed, chunk_size=9)
+pool_ok = open(pool_full).read() == open(pool_resumed).read()
+pool_lines = open(pool_full).read().splitlines()
+for i in (0, 1, 17, 49):
+    pool_P = point_mul(G, address_pool.pool_private_key(pool_master, i))
+    pool_pubkey = bytes_from_point(pool_P).hex()
+    pool_ok = pool_ok and has_even_y(pool_P)
+    pool_ok = pool_ok and pool_lines[i + 1] == "%d,%s,%s" % (i, pool_pubkey, generate_p2tr_address(pool_pubkey))
+try:
+    address_pool.generate_pool(pool_master, 60, pool_full, network='mainnet')
+    pool_ok = False
+except ValueError:
+    pass
+
+if pool_ok:
+    print(' * Passed address pool test.')
+else:
+    print(' * Failed address pool test.')
+
+# Bech32/Bech32m decoding (BIP173 and BIP350 vectors) and bulk encoding
+import generate_p2rt_address
+
+bech32_valid = [
+    ("BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4", 'mainnet', 0),
+    ("tb1qqqqqp399et2xygdj5xreqhjjvcmzhxw4aywxecjdzew6hylgvsesrxh6hy", 'testnet', 0),
+    ("bc1pw508d6qejxtdg4y5r3zarvary0c5xw7kw508d6qejxtdg4y5r3zarvary0c5xw7kt5nd6y", 'mainnet', 1),
+    ("BC1SW50QGDZ25J", 'mainnet', 16),
+    ("bc1zw508d6qejxtdg4y5r3zarvaryvaxxpcs", 'mainnet', 2),
+    ("tb1pqqqqp399et2xygdj5xreqhjjvcmzhxw4aywxecjdzew6hylgvsesf3hn0c", 'testnet', 1),
+    ("bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0", 'mainnet', 1),
+]
+bech32_invalid = [
+    ("tb1z0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqglt7rf", 'testnet'),
+    ("BC1S0XLXVLHEMJA6C4DQV22UAPCTQUPFHLXM9H8Z3K2E72Q4K9HCZ7VQ54WELL", 'mainnet'),
+    ("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kemeawh", 'mainnet'),
+    ("tb1q0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vq24jc47", 'testnet'),
+    ("bc1p38j9r5y49hruaue7wxjce0updqjuyyx0kh56v8s25huc6995vvpql3jow4", 'mainnet'),
+    ("BC130XLXVLHEMJA6C4DQV22UAPCTQUPFHLXM9H8Z3K2E72Q4K9HCZ7VQ7ZWS8R", 'mainnet'),
+    ("bc1pw5dgrnzv", 'mainnet'),
+    ("bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7v8n0nx0muaewav253zgeav", 'mainnet'),
+    ("tb1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vq47Zagq", 'testnet'),
+    ("bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7v07qwwzcrf", 'mainnet'),
+    ("tb1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vpggkg4j", 'testnet'),
+    ("bc1gmk9yu", 'mainnet'),
+    ("BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4", 'testnet'),
+]
+bech32_ok = True
+for address, network, version in bech32_valid:
+    decoded = generate_p2rt_address.decode_many([address], network)[0]
+    bech32_ok = bech32_ok and decoded is not None and decoded[0] == version
+for address, network in bech32_invalid:
+    bech32_ok = bech32_ok and generate_p2rt_address.decode_many([address], network)[0] is None
+bech32_keys = [os.urandom(32) for i in range(20)]
+bech32_addresses = generate_p2rt_address.encode_many(bech32_keys, 'mainnet')
+bech32_ok = bech32_ok and bech32_addresses == [generate_p2tr_address(k.hex(), 'mainnet') for k in bech32_keys]
+bech32_ok = bech32_ok and generate_p2rt_address.decode_many(bech32_addresses, 'mainnet') == [(1, k) for k in bech32_keys]
+
+if bech32_ok:
+    print(' * Passed bech32 test.')
+else:
+    print(' * Failed bech32 test.')
+
+# Signature cache: repeated valid signatures hit, invalid ones are never
+# cached, size 0 disables it and eviction keeps it within its bound
+sigcache_key = int_from_bytes(os.urandom(32)) % (n - 1) + 1
+sigcache_pubkey = schnorr_lib.pubkey_gen_from_int(sigcache_key)
+sigcache_msgs = [os.urandom(32) for i in range(8)]
+sigcache_sigs = [schnorr_lib.schnorr_sign(m, bytes_from_int(sigcache_key).hex()) for m in sigcache_msgs]
+schnorr_lib.set_sig_cache_size(4)
+sigcache_ok = schnorr_lib.schnorr_verify(sigcache_msgs[0], sigcache_pubkey, sigcache_sigs[0])
+sigcache_hits = schnorr_lib.sig_cache_stats()["hits"]
+sigcache_ok = sigcache_ok and schnorr_lib.schnorr_verify(sigcache_msgs[0], sigcache_pubkey, sigcache_sigs[0])
+sigcache_ok = sigcache_ok and schnorr_lib.sig_cache_stats()["hits"] == sigcache_hits + 1
+with contextlib.redirect_stdout(io.StringIO()):
+    for i in range(2):
+        sigcache_ok = sigcache_ok and not schnorr_lib.schnorr_verify(sigcache_msgs[1], sigcache_pubkey, sigcache_sigs[0])
+sigcache_ok = sigcache_ok and schnorr_lib.sig_cache_stats()["hits"] == sigcache_hits + 1
+for m, sig in zip(sigcache_msgs, sigcache_sigs):
+    sigcache_ok = sigcache_ok and schnorr_lib.schnorr_verify(m, sigcache_pubkey, sig)
+    sigcache_ok = sigcache_ok and schnorr_lib.sig_cache_stats()["size"] <= 4
+schnorr_lib.set_sig_cache_size(0)
+sigcache_hits = schnorr_lib.sig_cache_stats()["hits"]
+for i in range(2):
+    sigcache_ok = sigcache_ok and schnorr_lib.schnorr_verify(sigcache_msgs[0], sigcache_pubkey, sigcache_sigs[0])
+sigcache_ok = sigcache_ok and schnorr_lib.sig_cache_stats()["hits"] == sigcache_hits
+sigcache_ok = sigcache_ok and schnorr_lib.sig_cache_stats()["size"] == 0
+schnorr_lib.set_sig_cache_size(100000)
+
+if sigcache_ok:
+    print(' * Passed signature cache test.')
+else:
+    print(' * Failed signature cache test.')
+
+# Hot public keys: verification and multiplication with the retained tables
+# match the plain path, with GLV on and off, and the tables are evicted
+# least recently used beyond the memory cap
+schnorr_lib.set_sig_cache_size(0)
+hot_keys = [int_from_bytes(os.urandom(32)) % (n - 1) + 1 for i in range(3)]
+hot_pubkeys = [schnorr_lib.pubkey_gen_from_int(k) for k in hot_keys]
+hot_msg = os.urandom(32)
+hot_sigs = [schnorr_lib.schnorr_sign(hot_msg, bytes_from_int(k).hex()) for k in hot_keys]
+hot_ok = True
+with contextlib.redirect_stdout(io.StringIO()):
+    for glv in (True, False):
+        schnorr_lib.set_glv(glv)
+        plain = [schnorr_lib.schnorr_verify(hot_msg, pk, sig) for pk in hot_pubkeys for sig in hot_sigs]
+        for pk in hot_pubkeys:
+            schnorr_lib.register_hot_pubkey(pk)
+        hot = [schnorr_lib.schnorr_verify(hot_msg, pk, sig) for pk in hot_pubkeys for sig in hot_sigs]
+        hot_ok = hot_ok and hot == plain and hot == [i == j for i in range(3) for j in range(3)]
+        hot_d = int_from_bytes(os.urandom(32)) % n
+        hot_P = schnorr_lib.lift_x_even_y(hot_pubkeys[0])
+        hot_ok = hot_ok and schnorr_lib.point_mul(hot_P, hot_d) == point_mul(hot_P, hot_d)
+        for pk in hot_pubkeys:
+            schnorr_lib.unregister_hot_pubkey(pk)
+schnorr_lib.set_glv(True)
+hot_ok = hot_ok and schnorr_lib.hot_pubkey_stats()["keys"] == 0
+schnorr_lib.register_hot_pubkey(hot_pubkeys[0])
+hot_key_bytes = schnorr_lib.hot_pubkey_stats()["bytes"]
+schnorr_lib.set_hot_pubkey_memory(2 * hot_key_bytes)
+schnorr_lib.register_hot_pubkey(hot_pubkeys[1])
+schnorr_lib.schnorr_verify(hot_msg, hot_pubkeys[0], hot_sigs[0])  # Key 0 is now the most recently used
+schnorr_lib.register_hot_pubkey(hot_pubkeys[2])
+hot_stats = schnorr_lib.hot_pubkey_stats()
+hot_ok = hot_ok and hot_stats["keys"] == 2 and hot_stats["bytes"] <= hot_stats["max_bytes"]
+hot_points = [schnorr_lib.lift_x_even_y(pk) for pk in hot_pubkeys]
+hot_ok = hot_ok and [schnorr_lib._HOT_KEYS.get(P) is not None for P in hot_points] == [True, False, True]
+schnorr_lib.set_hot_pubkey_memory(0)
+hot_ok = hot_ok and schnorr_lib.hot_pubkey_stats()["keys"] == 0
+schnorr_lib.set_hot_pubkey_memory(16 * 1024 * 1024)
+schnorr_lib.set_sig_cache_size(100000)
+
+if hot_ok:
+    print(' * Passed hot public key test.')
+else:
+    print(' * Failed hot public key test.')
+
+# Verification service: mixed valid and invalid signatures over several
+# micro-batches, every caller gets its own result and stop() drains the queue
+# while refusing new requests
+import asyncio
+from verify_service import VerifyService
+
+async def verify_service_test() -> bool:
+    service = VerifyService(max_batch=4, max_delay=0.05)
+    await service.start()
+    expected = []
+    tasks = []
+    for i, (msg, pubkey, sig) in enumerate(batch):
+        if i % 3 == 1:
+            sig = sig[:32] + bytes_from_int((int_from_bytes(sig[32:]) + 1) % n)
+        expected.append(i != 5 and i % 3 != 1)
+        tasks.append(asyncio.ensure_future(service.verify(msg, pubkey, sig)))
+    await asyncio.sleep(0)
+    stopping = asyncio.ensure_future(service.stop())
+    await asyncio.sleep(0)
+    # Requests arriving while the queue is drained are refused
+    try:
+        await service.verify(*batch[0])
+        refused = False
+    except RuntimeError:
+        refused = True
+    await stopping
+    ok = refused and all(task.done() for task in tasks)
+    ok = ok and [task.result() for task in tasks] == expected
+    sizes = service.stats()["batch_size"]
+    return ok and sizes["sum"] == len(batch) and sizes["count"] >= len(batch) // 4
+
+schnorr_lib.set_sig_cache_size(0)
+service_ok = asyncio.run(verify_service_test())
+schnorr_lib.set_sig_cache_size(100000)
+
+if service_ok:
+    print(' * Passed verification service test.')
+else:
+    print(' * Failed verification service test.')
+
+# MuSig2 between signer servers and a coordinator over Unix sockets:
+# pipelined sessions give the same aggregate key as in-process signing,
+# a signer sending a wrong si or malformed nonces ends up in faulty and
+# a signer that does not answer times out
+import shutil
+import musig2_network
+
+class WrongSigner(musig2_network.SignerServer):
+    def partial_sign(self, request, r_list):
+        return (super().partial_sign(request, r_list) + 1) % n
+
+class ShortNonceSigner(musig2_network.SignerServer):
+    def answer(self, request, sessions):
+        response = super().answer(request, sessions)
+        if "R" in response:
+            response["R"] = response["R"][:1]
+        return response
+
+async def silent_signer(reader, writer):
+    await reader.read()
+    writer.close()
+
+async def network_test(directory: str) -> bool:
+    users = [{"privateKey": bytes_from_int(int_from_bytes(os.urandom(32)) % (n - 1) + 1).hex()} for i in range(3)]
+    kinds = [musig2_network.SignerServer, WrongSigner, ShortNonceSigner]
+    signers = {}
+    servers = []
+    for kind in kinds:
+        for i, u in enumerate(users):
+            address = "unix:" + os.path.join(directory, "%s%d.sock" % (kind.__name__, i))
+            signer = musig2_network.SignerServer(u["privateKey"], pool_size=4) if i != 1 else kind(u["privateKey"], pool_size=4)
+            signers.setdefault(kind, []).append(address)
+            servers.append((signer, await musig2_network.start_server(signer.handle, address)))
+    silent = "unix:" + os.path.join(directory, "silent.sock")
+    servers.append((None, await musig2_network.start_server(silent_signer, silent)))
+    try:
+        msgs = [os.urandom(32) for i in range(4)]
+        async with musig2_network.Coordinator(signers[musig2_network.SignerServer], timeout=5) as coordinator:
+            results = await coordinator.sign_many(msgs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            local_X = schnorr_lib.schnorr_musig2_sign(msgs[0], [dict(u) for u in users])[1]
+        ok = all(X == local_X and schnorr_lib.schnorr_verify(m, X, sig) for m, (sig, X) in zip(msgs, results))
+        ok = ok and not coordinator.faulty
+
+        for kind in (WrongSigner, ShortNonceSigner):
+            async with musig2_network.Coordinator(signers[kind], timeout=5) as coordinator:
+                try:
+                    await coordinator.sign(msgs[0])
+                    ok = False
+                except RuntimeError:
+                    pass
+            ok = ok and coordinator.faulty == {signers[kind][1]}
+
+        try:
+            await musig2_network.Coordinator(signers[musig2_network.SignerServer][:1] + [silent], timeout=0.2).connect()
+            ok = False
+        except RuntimeError as e:
+            ok = ok and silent in str(e)
+        return ok
+    finally:
+        for signer, server in servers:
+            server.close()
+            await server.wait_closed()
+            if signer is not None:
+                signer.close()
+        # Let the handlers see their connections closed
+        await asyncio.sleep(0.05)
+
+network_dir = tempfile.mkdtemp()
+try:
+    network_ok = asyncio.run(network_test(network_dir))
+finally:
+    shutil.rmtree(network_dir, ignore_errors=True)
+
+if network_ok:
+    print(' * Passed MuSig2 network test.')
+else:
+    print(' * Failed MuSig2 network test.')
+
+# Verification pool: results in the order of the items across chunks and
+# workers, with batch and single verification, and no work after shutdown
+batch_expected = [i != 5 for i in range(len(batch))]
+with schnorr_lib.VerifyPool(workers=2, chunk_size=3, hot_pubkeys=[batch[0][1]]) as verify_pool:
+    pool_ok = verify_pool.verify(batch) == batch_expected
+    pool_ok = pool_ok and verify_pool.verify(batch[::-1]) == batch_expected[::-1]
+    pool_ok = pool_ok and verify_pool.verify_one(*batch[0]) and not verify_pool.verify_one(*batch[5])
+with schnorr_lib.VerifyPool(workers=2, chunk_size=3, batch=False) as verify_pool:
+    pool_ok = pool_ok and verify_pool.verify(batch) == batch_expected
+try:
+    verify_pool.verify(batch)
+    pool_ok = False
+except RuntimeError:
+    pass
+
+if pool_ok:
+    print(' * Passed verification pool test.')
+else:
+    print(' * Failed verification pool test.')
+
+# Signer bound to one key: sign and sign_many verify for keys of both
+# parities, and the verify policy decides whether the check runs (a check
+# that always fails is swapped in to see it)
+signer_ok = True
+signer_parities = set()
+while len(signer_parities) < 2:
+    signer_d = int_from_bytes(os.urandom(32)) % (n - 1) + 1
+    signer_parities.add(has_even_y(point_mul(G, signer_d)))
+    signer = schnorr_lib.Signer(bytes_from_int(signer_d).hex())
+    signer_ok = signer_ok and signer.pubkey == schnorr_lib.pubkey_gen_from_int(signer_d)
+    signer_msgs = [os.urandom(32) for i in range(5)]
+    signer_sigs = signer.sign_many(signer_msgs) + [signer.sign(signer_msgs[0])]
+    signer_ok = signer_ok and all(schnorr_lib.schnorr_verify(m, signer.pubkey, sig)
+                                  for m, sig in zip(signer_msgs + signer_msgs[:1], signer_sigs))
+
+# Whether sign and sign_many check their signatures
+def signer_checks(verify_policy: str, sample_rate: float = 0.01) -> list:
+    signer = schnorr_lib.Signer(bytes_from_int(signer_d).hex(), verify_policy, sample_rate)
+    verify_point, batch_verify = schnorr_lib._schnorr_verify_point, schnorr_lib.schnorr_batch_verify
+    schnorr_lib._schnorr_verify_point = lambda *args: False
+    schnorr_lib.schnorr_batch_verify = lambda items: [False for item in items]
+    checked = []
+    try:
+        for sign in (lambda: signer.sign(signer_msgs[0]), lambda: signer.sign_many(signer_msgs)):
+            try:
+                sign()
+                checked.append(False)
+            except RuntimeError:
+                checked.append(True)
+    finally:
+        schnorr_lib._schnorr_verify_point, schnorr_lib.schnorr_batch_verify = verify_point, batch_verify
+    return checked
+
+signer_ok = signer_ok and signer_checks("always") == [True, True]
+signer_ok = signer_ok and signer_checks("off") == [False, False]
+signer_ok = signer_ok and signer_checks("sampled", 1.0) == [True, True]
+signer_ok = signer_ok and signer_checks("sampled", 0.0) == [False, False]
+try:
+    schnorr_lib.Signer(bytes_from_int(signer_d).hex(), "never")
+    signer_ok = False
+except ValueError:
+    pass
+
+if signer_ok:
+    print(' * Passed signer test.')
+else:
+    print(' * Failed signer test.')
+
+# Profiling: counters of nested spans, one scalar multiplication per pair
+# whether Strauss or Pippenger is used, and the Prometheus export
+schnorr_lib.enable_profiling(True)
+schnorr_lib.reset_profile_stats()
+profile_points = [schnorr_lib.point_mul_G(int_from_bytes(os.urandom(32)) % (n - 1) + 1) for i in range(30)]
+with schnorr_lib.profile("outer") as profile_outer:
+    with schnorr_lib.profile("add") as profile_add:
+        schnorr_lib.point_add(profile_points[0], profile_points[1])
+    with schnorr_lib.profile("strauss") as profile_strauss:
+        schnorr_lib._multi_mul_jacobian([(int_from_bytes(os.urandom(32)), P) for P in profile_points[:5]])
+    with schnorr_lib.profile("pippenger") as profile_pippenger:
+        schnorr_lib._multi_mul_jacobian([(int_from_bytes(os.urandom(32)), P) for P in profile_points])
+    schnorr_lib.schnorr_sign(os.urandom(32), bytes_from_int(signer_d).hex())
+profile_ok = profile_add["point_additions"] == 1 and profile_add["field_inversions"] == 1
+profile_ok = profile_ok and profile_strauss["scalar_multiplications"] == 5
+profile_ok = profile_ok and profile_pippenger["scalar_multiplications"] == 30
+profile_stats = schnorr_lib.profile_stats()
+profile_ok = profile_ok and profile_stats["schnorr_sign"]["calls"] == 1
+profile_ok = profile_ok and profile_stats["schnorr_sign"]["tagged_hashes"] >= 3
+profile_ok = profile_ok and profile_outer["scalar_multiplications"] >= 35 + profile_stats["schnorr_sign"]["scalar_multiplications"]
+profile_ok = profile_ok and profile_outer["point_additions"] > profile_add["point_additions"]
+profile_text = schnorr_lib.profile_prometheus()
+profile_ok = profile_ok and "# TYPE schnorr_operation_calls_total counter" in profile_text
+profile_ok = profile_ok and "# TYPE schnorr_operation_max_seconds gauge" in profile_text
+profile_ok = profile_ok and 'schnorr_operation_calls_total{operation="schnorr_sign"} 1\n' in profile_text
+profile_ok = profile_ok and 'schnorr_scalar_multiplications_total{operation="pippenger"} 30\n' in profile_text
+schnorr_lib.enable_profiling(False)
+schnorr_lib.reset_profile_stats()
+
+if profile_ok:
+    print(' * Passed profiling test.')
+else:
+    print(' * Failed profiling test.')
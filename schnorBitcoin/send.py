@@ -49,8 +49,8 @@ print(public_keys)
 PK_agg = compute_aggregate_public_key(public_keys)
 print("PK_agg: ", PK_agg)
 
-# Assuming PK_agg is a Point object with x and y coordinates
-x_only_pk = PK_agg.x.to_bytes(32, 'big')
+# PK_agg is the 32-byte x-only aggregate public key
+x_only_pk = PK_agg
 
 # No tweak for key-only outputs (merkle_root = 0)
 taproot_output_key = x_only_pk
@@ -0,0 +1,152 @@
+import asyncio
+import time
+from typing import Optional
+
+from schnorr_lib import schnorr_batch_verify, VerifyPool
+
+
+# Bounds of the latency (seconds) and batch size histograms
+LATENCY_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_SIZE_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+# Cumulative histogram with fixed upper bounds (the last bucket is +Inf)
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+# Asyncio front end of schnorr_verify for servers receiving signatures one
+# at a time. Requests are queued and grouped in micro-batches of at most
+# max_batch items, waiting at most max_delay seconds after the first one;
+# each batch is checked with batch verification off the event loop (in a
+# thread, or in the VerifyPool if one is given) and every caller gets its
+# own result. Up to max_inflight batches are verified at the same time.
+class VerifyService:
+    def __init__(self, max_batch: int = 128, max_delay: float = 0.005,
+                 pool: Optional[VerifyPool] = None, max_inflight: int = 1):
+        if max_batch < 1:
+            raise ValueError('The batch size must be at least 1.')
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pool = pool
+        self.latency = Histogram(LATENCY_BOUNDS)
+        self.batch_size = Histogram(BATCH_SIZE_BOUNDS)
+        self._max_inflight = max_inflight
+        self._queue = None
+        self._inflight = None
+        self._dispatcher = None
+        self._stopping = False
+        self._batches = set()
+
+    async def start(self) -> None:
+        if self._dispatcher is not None:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        self._inflight = asyncio.Semaphore(self._max_inflight)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    # Stop accepting requests, the queued ones are verified first
+    async def stop(self) -> None:
+        if self._dispatcher is None or self._stopping:
+            return
+        self._stopping = True
+        await self._queue.join()
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        if self._batches:
+            await asyncio.gather(*self._batches)
+        self._dispatcher = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    # Verify one signature, resolved when its micro-batch has been checked
+    async def verify(self, msg: bytes, pubkey: bytes, sig: bytes) -> bool:
+        if len(msg) != 32:
+            raise ValueError('The message must be a 32-byte array.')
+        if len(pubkey) != 32:
+            raise ValueError('The public key must be a 32-byte array.')
+        if len(sig) != 64:
+            raise ValueError('The signature must be a 64-byte array.')
+        if self._dispatcher is None or self._stopping:
+            raise RuntimeError('The verification service is not running.')
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((msg, pubkey, sig), future, time.perf_counter()))
+        return await future
+
+    # Latency and batch size histograms
+    def stats(self) -> dict:
+        return {"latency_seconds": self.latency.snapshot(),
+                "batch_size": self.batch_size.snapshot()}
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(requests) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    requests.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._inflight.acquire()
+            task = asyncio.create_task(self._verify_batch(requests))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _verify_batch(self, requests: list) -> None:
+        loop = asyncio.get_running_loop()
+        items = [item for item, _, _ in requests]
+        verify = self.pool.verify if self.pool is not None else schnorr_batch_verify
+        try:
+            results = await loop.run_in_executor(None, verify, items)
+        except Exception as e:
+            for _, future, _ in requests:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            now = time.perf_counter()
+            self.batch_size.observe(len(items))
+            for (_, future, started), result in zip(requests, results):
+                self.latency.observe(now - started)
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._inflight.release()
+            for _ in requests:
+                self._queue.task_done()